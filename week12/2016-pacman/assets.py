@@ -0,0 +1,57 @@
+import os
+import pygame
+
+
+class Assets:
+    """
+    Image cache. Every file is read from disk once, converted to the pixel format of the display
+    and shared by all game objects, so blitting it needs no conversion.
+    """
+    def __init__(self):
+        self.images = {}
+
+    def get(self, path):
+        """
+        Returns the image of the file, loading it on first use.
+        Should be called after the display mode is set, otherwise images can't be converted.
+        """
+        key = os.path.normpath(path)
+        image = self.images.get(key)
+        if image is None:
+            image = self.convert(pygame.image.load(path))
+            self.images[key] = image
+        return image
+
+    @staticmethod
+    def convert(image):
+        if pygame.display.get_surface() is None:
+            return image
+        # images with transparent pixels keep their alpha channel
+        if image.get_flags() & pygame.SRCALPHA:
+            return image.convert_alpha()
+        return image.convert()
+
+    def preload(self, paths):
+        """
+        Loads the files at startup, so the first frames don't wait for the disk.
+        """
+        for path in paths:
+            self.get(path)
+
+    def load_atlas(self, path, tile_size, names, size=None):
+        """
+        Loads a texture atlas: an image with tiles of tile_size in rows, left to right.
+        The i-th tile becomes the image of names[i], a subsurface sharing the atlas pixels,
+        or a copy scaled to size if it's given and differs from tile_size.
+        """
+        atlas = self.get(path)
+        columns = atlas.get_width() // tile_size
+        for i, name in enumerate(names):
+            rect = pygame.Rect(i % columns * tile_size, i // columns * tile_size, tile_size, tile_size)
+            image = atlas.subsurface(rect)
+            if size is not None and size != tile_size:
+                image = pygame.transform.scale(image, (size, size))
+            self.images[os.path.normpath(name)] = image
+
+
+assets = Assets()
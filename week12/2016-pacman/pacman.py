@@ -1,115 +1,164 @@
+import argparse
+import math
+import os
 import sys
 import pygame
 from pygame.locals import *
-from math import floor
 import random
 
+from assets import assets, Assets
+from tilemap import TileMap, WALL
+from pathfinding import DistanceField
 
-def init_window():
-    pygame.init()
-    pygame.display.set_mode((512, 512))
-    pygame.display.set_caption('Pacman')
+# the loop runner is shared by the games, its one copy lives with the week13 game;
+# appended, so the modules of this folder come first
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'week13'))
+from loop_runner import LoopRunner
 
+# direction number -> step in tiles: 1 right, 2 down, 3 left, 4 up
+DIRECTIONS = {1: (1, 0), 2: (0, 1), 3: (-1, 0), 4: (0, -1)}
 
-def draw_background(scr, img=None):
-    if img:
-        scr.blit(img, (0, 0))
-    else:
-        bg = pygame.Surface(scr.get_size())
-        bg.fill((128, 128, 128))
-        scr.blit(bg, (0, 0))
+
+def init_window(size=(512, 512)):
+    pygame.init()
+    pygame.display.set_mode(size)
+    pygame.display.set_caption('Pacman')
 
 
-class GameObject(pygame.sprite.Sprite):
-    def __init__(self, img, x, y, tile_size, map_size):
-        pygame.sprite.Sprite.__init__(self)
-        self.image = pygame.image.load(img)
+class GameObject(pygame.sprite.DirtySprite):
+    def __init__(self, img, x, y, tile_size, tilemap):
+        pygame.sprite.DirtySprite.__init__(self)
+        # all objects of a kind share one image, loaded once
+        self.image = assets.get(img)
+        # actors are drawn above the pellets
+        self._layer = 1
         self.screen_rect = None
+        # screen_rect before the last tick, drawing interpolates from it
+        self.prev_rect = None
         self.x = 0
         self.y = 0
         self.tick = 0
         self.tile_size = tile_size
-        self.map_size = map_size
+        self.tilemap = tilemap
         self.set_coord(x, y)
+        self.prev_rect = self.screen_rect
+        # where the sprite group draws the object this frame
+        self.rect = self.screen_rect.copy()
 
     def set_coord(self, x, y):
         self.x = x
         self.y = y
-        self.screen_rect = Rect(floor(x) * self.tile_size, floor(y) * self.tile_size, self.tile_size, self.tile_size )
-
-    def game_tick(self):
+        # objects are drawn where they are, also between tiles, so the motion is smooth at any tick rate
+        self.screen_rect = Rect(round(x * self.tile_size), round(y * self.tile_size), self.tile_size, self.tile_size)
+
+    def game_tick(self, dt):
+        """
+        Advances the object by one simulation step.
+        :param dt: length of the step in seconds
+        """
         self.tick += 1
-
-    def draw(self, scr):
-        scr.blit(self.image, (self.screen_rect.x, self.screen_rect.y))
+        self.prev_rect = self.screen_rect
+
+    def move(self, direction, distance):
+        """
+        Moves the object in the direction unless a wall is in the way.
+        :return: False if the object was stopped by a wall
+        """
+        dx, dy = DIRECTIONS[direction]
+        # the object moves along the row or column of the tile it's on, so it fits into corridors
+        lane_x = self.x if dx else round(self.x)
+        lane_y = self.y if dy else round(self.y)
+        off_x, off_y = lane_x - self.x, lane_y - self.y
+        if abs(off_x) + abs(off_y) > distance:
+            # too far from the lane to turn into it in one step, the object slides towards it first
+            self.set_coord(self.x + math.copysign(min(abs(off_x), distance), off_x),
+                           self.y + math.copysign(min(abs(off_y), distance), off_y))
+            return True
+        x = lane_x + dx * distance
+        y = lane_y + dy * distance
+        if self.tilemap.blocked(x, y):
+            # stops at the last whole tile, which is free, as the object was standing on it
+            self.set_coord(round(self.x), round(self.y))
+            return False
+        self.set_coord(x, y)
+        return True
+
+    def update(self, alpha=1):
+        """
+        Places the sprite for the next frame, called by the sprite group.
+        :param alpha: share of the tick passed, the object slides from its previous place
+        """
+        x = round(self.prev_rect.x + alpha * (self.screen_rect.x - self.prev_rect.x))
+        y = round(self.prev_rect.y + alpha * (self.screen_rect.y - self.prev_rect.y))
+        # only a sprite that moved is redrawn
+        if (x, y) != self.rect.topleft:
+            self.rect.topleft = (x, y)
+            self.dirty = 1
+
+
+class Pellet(pygame.sprite.DirtySprite):
+    """
+    Dot on a floor tile that pacman eats. Pellets don't move, so after the first frame
+    they are redrawn only where an actor passes over them.
+    """
+    def __init__(self, image, x, y, tile_size):
+        pygame.sprite.DirtySprite.__init__(self)
+        self.image = image
+        self._layer = 0
+        self.rect = Rect(x * tile_size, y * tile_size, tile_size, tile_size)
+
+
+def pellet_image(tile_size):
+    image = pygame.Surface((tile_size, tile_size), SRCALPHA)
+    pygame.draw.circle(image, (255, 220, 120), (tile_size // 2, tile_size // 2), max(tile_size // 8, 1))
+    return Assets.convert(image)
 
 
 class Ghost(GameObject):
-    def __init__(self, x, y, tile_size, map_size):
-        GameObject.__init__(self, './resources/ghost.png', x, y, tile_size, map_size)
+    def __init__(self, x, y, tile_size, tilemap, field=None):
+        """
+        :param field: DistanceField to pacman shared by the ghosts, without it the ghost wanders randomly
+        """
+        GameObject.__init__(self, './resources/ghost.png', x, y, tile_size, tilemap)
         self.direction = 0
-        self.velocity = 4.0 / 10.0
-
-    def game_tick(self):
-        super(Ghost, self).game_tick()
-        if self.tick % 20 == 0 or self.direction == 0:
+        # tiles per second
+        self.velocity = 4.0
+        # a wandering ghost turns every 2 seconds
+        self.wander_time = 2.0
+        self.wander = 0
+        self.field = field
+
+    def game_tick(self, dt):
+        super(Ghost, self).game_tick(dt)
+        # the way to pacman goes down the distances from the tile the ghost stands on
+        chase = self.field.direction(round(self.x), round(self.y)) if self.field else 0
+        self.wander -= dt
+        if chase:
+            self.direction = chase
+        elif self.wander <= 0 or self.direction == 0:
+            self.direction = random.randint(1, 4)
+            self.wander = self.wander_time
+        if not self.move(self.direction, self.velocity * dt):
             self.direction = random.randint(1, 4)
-
-        if self.direction == 1:
-            self.x += self.velocity
-            if self.x >= self.map_size-1:
-                self.x = self.map_size-1
-                self.direction = random.randint(1, 4)
-        elif self.direction == 2:
-            self.y += self.velocity
-            if self.y >= self.map_size-1:
-                self.y = self.map_size-1
-                self.direction = random.randint(1, 4)
-        elif self.direction == 3:
-            self.x -= self.velocity
-            if self.x <= 0:
-                self.x = 0
-                self.direction = random.randint(1, 4)
-        elif self.direction == 4:
-            self.y -= self.velocity
-            if self.y <= 0:
-                self.y = 0
-                self.direction = random.randint(1, 4)
-        self.set_coord(self.x, self.y)
 
 
 class Pacman(GameObject):
-    def __init__(self, x, y, tile_size, map_size):
-        GameObject.__init__(self, './resources/pacman.png', x, y, tile_size, map_size)
+    def __init__(self, x, y, tile_size, tilemap):
+        GameObject.__init__(self, './resources/pacman.png', x, y, tile_size, tilemap)
         self.direction = 0
-        self.velocity = 4.0 / 10.0
-
-    def game_tick(self):
-        super(Pacman, self).game_tick()
-        if self.direction == 1:
-            self.x += self.velocity
-            if self.x >= self.map_size-1:
-                self.x = self.map_size-1
-        elif self.direction == 2:
-            self.y += self.velocity
-            if self.y >= self.map_size-1:
-                self.y = self.map_size-1
-        elif self.direction == 3:
-            self.x -= self.velocity
-            if self.x <= 0:
-                self.x = 0
-        elif self.direction == 4:
-            self.y -= self.velocity
-            if self.y <= 0:
-                self.y = 0
-
-        self.set_coord(self.x, self.y)
+        # tiles per second
+        self.velocity = 4.0
+
+    def game_tick(self, dt):
+        super(Pacman, self).game_tick(dt)
+        if self.direction != 0:
+            self.move(self.direction, self.velocity * dt)
 
 
 def process_events(events, packman):
     for event in events:
         if (event.type == QUIT) or (event.type == KEYDOWN and event.key == K_ESCAPE):
-            sys.exit(0)
+            return True
         elif event.type == KEYDOWN:
             if event.key == K_LEFT:
                 packman.direction = 3
@@ -121,23 +170,79 @@ def process_events(events, packman):
                 packman.direction = 2
             elif event.key == K_SPACE:
                 packman.direction = 0
+    return False
 
 
 if __name__ == '__main__':
-    init_window()
-    tile_size = 32
-    map_size = 16
-    ghost = Ghost(0, 0, tile_size, map_size)
-    pacman = Pacman(5, 5, tile_size, map_size)
-    background = None #pygame.image.load("./resources/background.png")
+    parser = argparse.ArgumentParser(description='Pacman')
+    parser.add_argument('--map', default='./resources/maze.txt', help='text or binary map file')
+    parser.add_argument('--generate', type=int, nargs=2, metavar=('WIDTH', 'HEIGHT'),
+                        help='plays a random maze of this size instead of the map file')
+    parser.add_argument('--seed', type=int, help='seed of the random maze and the ghosts')
+    parser.add_argument('--tile-size', type=int, help='tile size in pixels, by default the map fits into 1024 pixels')
+    parser.add_argument('--ghosts', type=int, default=1, help='number of ghosts, the spawn points of the map are taken first')
+    parser.add_argument('--no-pellets', dest='pellets', action='store_false',
+                        help='no pellets on the floor, random mazes never have them')
+    parser.add_argument('--tick-rate', type=int, default=60, help='simulation steps per second')
+    parser.add_argument('--fps', type=int, default=144, help='frame rate cap')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.generate:
+        tilemap = TileMap.generate(*args.generate, seed=args.seed)
+        # a pellet on every tile of a big maze would be more sprites than the group can go through every frame
+        args.pellets = False
+    else:
+        tilemap = TileMap.load(args.map)
+    tile_size = args.tile_size or max(2, min(32, 1024 // max(tilemap.width, tilemap.height)))
+    init_window((tilemap.width * tile_size, tilemap.height * tile_size))
+    # pacman, ghost and wall images come from one atlas read at startup
+    assets.load_atlas('./resources/atlas.png', 32,
+                      ['./resources/pacman.png', './resources/ghost.png', './resources/wall.png'], tile_size)
+    # maps without a 'P' start pacman on their first floor tile
+    pacman = Pacman(*tilemap.spawn('P'), tile_size, tilemap)
+    # all ghosts chase pacman along one distance field
+    field = DistanceField(tilemap)
+    spawns = tilemap.spawns.get('G', [])[:args.ghosts]
+    floor_tiles = [(x, y) for y in range(tilemap.height) for x in range(tilemap.width) if tilemap.tiles[y, x] != WALL]
+    free = [tile for tile in floor_tiles if tile != (pacman.x, pacman.y) and tile not in set(spawns)]
+    spawns += random.sample(free, max(0, min(args.ghosts - len(spawns), len(free))))
+    ghosts = [Ghost(x, y, tile_size, tilemap, field) for x, y in spawns]
+    background = None #assets.get("./resources/background.png")
+    # the floor and the walls never change, they are drawn once
+    tilemap.prerender(tile_size, assets.get('./resources/wall.png'), background or (128, 128, 128))
     screen = pygame.display.get_surface()
-
-    while True:
-        process_events(pygame.event.get(), pacman)
-        pygame.time.delay(100)
-        ghost.game_tick()
-        pacman.game_tick()
-        draw_background(screen, background)
-        pacman.draw(screen)
-        ghost.draw(screen)
-        pygame.display.update()
+    # pellets on the free floor tiles, one per tile
+    taken = set(spawns) | {(pacman.x, pacman.y)}
+    image = pellet_image(tile_size)
+    pellets = {tile: Pellet(image, *tile, tile_size) for tile in floor_tiles if args.pellets and tile not in taken}
+
+    # all sprites are drawn by one group, which blits only what changed over the static layer
+    # and returns the changed rects for the display update
+    sprites = pygame.sprite.LayeredDirty(*pellets.values(), pacman, *ghosts)
+    sprites.clear(screen, tilemap.surface)
+    tilemap.draw(screen)
+    pygame.display.update()
+
+    # events are read as they come, the game advances in fixed steps of dt whatever the frame rate,
+    # with speeds in tiles per second, and frames are drawn in between, interpolated
+    runner = LoopRunner(tick_rate=args.tick_rate, fps=args.fps)
+
+    def tick():
+        # computed again only when pacman comes to another tile
+        field.update((round(pacman.x), round(pacman.y)))
+        for ghost in ghosts:
+            ghost.game_tick(runner.dt)
+        pacman.game_tick(runner.dt)
+        pellet = pellets.pop((round(pacman.x), round(pacman.y)), None)
+        if pellet is not None:
+            # the group clears the place of a removed sprite
+            pellet.kill()
+
+    def draw(alpha):
+        sprites.update(alpha)
+        pygame.display.update(sprites.draw(screen))
+
+    runner.start(lambda events: process_events(events, pacman), tick, draw)
+    pygame.quit()
+    sys.exit(0)
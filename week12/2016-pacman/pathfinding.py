@@ -0,0 +1,119 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from tilemap import TileMap, WALL
+
+UNSEEN = -1
+BLOCKED = -2
+
+
+class DistanceField:
+    """
+    Distances in steps from one goal tile to every floor tile of a map, found by breadth first search.
+    One field is shared by all ghosts chasing the same goal: it is computed again only when the goal
+    moves to another tile, and a ghost's decision is a lookup of its four neighbours.
+    """
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        # the map gets a border of walls, so neighbours of any tile can be read without bounds checks
+        padded = np.pad(tilemap.tiles, 1, constant_values=WALL)
+        self.stride = padded.shape[1]
+        self.free = np.where(padded.ravel() == WALL, BLOCKED, UNSEEN).astype(np.int32)
+        self.dist = self.free.copy()
+        # flat offsets of the neighbours in the order of the direction numbers: right, down, left, up
+        self.offsets = np.array([1, self.stride, -1, -self.stride])
+        self.goal = None
+
+    def index(self, x, y):
+        return (y + 1) * self.stride + x + 1
+
+    def update(self, goal):
+        """
+        Makes goal, an (x, y) tile, the target of the field. Does nothing if it already is.
+        """
+        goal = tuple(goal)
+        if goal == self.goal:
+            return
+        self.goal = goal
+        dist = self.free.copy()
+        frontier = np.array([self.index(*goal)])
+        if dist[frontier[0]] == BLOCKED:
+            self.dist = dist
+            return
+        dist[frontier] = 0
+        # the last one wins, so every tile of a new frontier is kept once
+        stamp = np.zeros(len(dist), dtype=np.int64)
+        step = 0
+        while len(frontier):
+            step += 1
+            around = (frontier[:, None] + self.offsets).ravel()
+            around = around[dist[around] == UNSEEN]
+            order = np.arange(len(around))
+            stamp[around] = order
+            frontier = around[stamp[around] == order]
+            dist[frontier] = step
+        self.dist = dist
+
+    def distance(self, x, y):
+        """
+        Returns the number of steps from tile (x, y) to the goal, negative if it can't be reached.
+        """
+        return int(self.dist[self.index(x, y)])
+
+    def direction(self, x, y):
+        """
+        Returns the direction number (1 right, 2 down, 3 left, 4 up) of the neighbour closest
+        to the goal, or 0 at the goal and where the goal can't be reached.
+        """
+        here = self.index(x, y)
+        best = self.dist[here]
+        if best <= 0:
+            return 0
+        choice = 0
+        for k, offset in enumerate(self.offsets.tolist()):
+            d = self.dist[here + offset]
+            if 0 <= d < best:
+                best = d
+                choice = k + 1
+        return choice
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times distance fields and ghost decisions on a generated maze.')
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--ghosts', type=int, default=300)
+    parser.add_argument('--moves', type=int, default=50, help='tiles the goal moves')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tilemap = TileMap.generate(args.size, args.size, seed=args.seed)
+    rng = random.Random(args.seed)
+    ys, xs = np.nonzero(tilemap.tiles != WALL)
+    tiles = list(zip(xs.tolist(), ys.tolist()))
+    ghosts = rng.sample(tiles, args.ghosts)
+    field = DistanceField(tilemap)
+    goal = rng.choice(tiles)
+    update = []
+    decide = []
+    for i in range(args.moves):
+        start = time.perf_counter()
+        field.update(goal)
+        update.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for x, y in ghosts:
+            field.direction(x, y)
+        decide.append(time.perf_counter() - start)
+        # the goal walks to a free neighbour, like pacman does
+        x, y = goal
+        goal = rng.choice([(x + dx, y + dy) for dx, dy in ((1, 0), (0, 1), (-1, 0), (0, -1))
+                           if not tilemap.is_wall(x + dx, y + dy)])
+    print('{0}x{0} map, {1} ghosts'.format(args.size, args.ghosts))
+    print('field update  {:8.2f} ms mean {:8.2f} ms max'.format(1000 * np.mean(update), 1000 * np.max(update)))
+    print('all decisions {:8.2f} ms mean'.format(1000 * np.mean(decide)))
+
+
+if __name__ == '__main__':
+    main()
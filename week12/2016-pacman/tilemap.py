@@ -0,0 +1,157 @@
+import struct
+from math import floor
+
+import numpy as np
+import pygame
+
+FLOOR = 0
+WALL = 1
+# binary map file: magic, width, height, then one byte per tile row by row,
+# then the number of spawn points and every one of them as letter, x, y
+HEADER = struct.Struct('<4sHH')
+COUNT = struct.Struct('<H')
+SPAWN = struct.Struct('<cHH')
+MAGIC = b'PMAP'
+
+
+class TileMap:
+    """
+    Maze made of square tiles, kept in a compact numpy array indexed [y, x].
+    The walls and the floor are drawn once into a cached surface, so a frame
+    only blits that surface, and wall queries are array lookups.
+    """
+    def __init__(self, tiles, spawns=None):
+        """
+        :param tiles: 2D array of FLOOR and WALL values
+        :param spawns: dict letter -> list of (x, y) tiles, e.g. 'P' for pacman and 'G' for ghosts
+        """
+        self.tiles = np.asarray(tiles, dtype=np.uint8)
+        self.height, self.width = self.tiles.shape
+        self.spawns = spawns or {}
+        self.surface = None
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a text map, where '#' is a wall and any other letter is floor, or a binary map written by save().
+        Letters other than '#' and '.' in a text map mark spawn points.
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        if data.startswith(MAGIC):
+            magic, width, height = HEADER.unpack_from(data)
+            tiles = np.frombuffer(data, dtype=np.uint8, count=width * height, offset=HEADER.size)
+            offset = HEADER.size + width * height
+            spawns = {}
+            # files written before spawn points were saved end after the tiles
+            if len(data) > offset:
+                count, = COUNT.unpack_from(data, offset)
+                start = offset + COUNT.size
+                for letter, x, y in SPAWN.iter_unpack(data[start:start + count * SPAWN.size]):
+                    spawns.setdefault(letter.decode(), []).append((x, y))
+            return cls(tiles.reshape(height, width), spawns)
+        lines = data.decode().splitlines()
+        lines = [line for line in lines if line]
+        width = max(len(line) for line in lines)
+        tiles = np.full((len(lines), width), WALL, dtype=np.uint8)
+        spawns = {}
+        for y, line in enumerate(lines):
+            for x, char in enumerate(line):
+                if char != '#':
+                    tiles[y, x] = FLOOR
+                if char not in '#. ':
+                    spawns.setdefault(char, []).append((x, y))
+        return cls(tiles, spawns)
+
+    @classmethod
+    def generate(cls, width, height, seed=None, loops=0.1):
+        """
+        Makes a random maze. Corridors are carved between the tiles with odd coordinates
+        by a depth first search, then a share of the walls between two corridors is knocked down,
+        so the maze has loops and ghosts can come from several sides.
+        :param loops: share of the inner walls removed after carving
+        """
+        rng = np.random.default_rng(seed)
+        tiles = np.full((height, width), WALL, dtype=np.uint8)
+        cells_x, cells_y = (width - 1) // 2, (height - 1) // 2
+        seen = np.zeros((cells_y, cells_x), dtype=bool)
+        steps = ((1, 0), (0, 1), (-1, 0), (0, -1))
+        stack = [(0, 0)]
+        seen[0, 0] = True
+        tiles[1, 1] = FLOOR
+        while stack:
+            cx, cy = stack[-1]
+            around = [(cx + dx, cy + dy) for dx, dy in steps
+                      if 0 <= cx + dx < cells_x and 0 <= cy + dy < cells_y and not seen[cy + dy, cx + dx]]
+            if not around:
+                stack.pop()
+                continue
+            nx, ny = around[rng.integers(len(around))]
+            seen[ny, nx] = True
+            tiles[2 * ny + 1, 2 * nx + 1] = FLOOR
+            tiles[cy + ny + 1, cx + nx + 1] = FLOOR
+            stack.append((nx, ny))
+        # walls with floor on both sides, left and right or above and below
+        inner = tiles[1:-1, 1:-1] == WALL
+        between = inner & (((tiles[1:-1, :-2] == FLOOR) & (tiles[1:-1, 2:] == FLOOR)) |
+                           ((tiles[:-2, 1:-1] == FLOOR) & (tiles[2:, 1:-1] == FLOOR)))
+        ys, xs = np.nonzero(between)
+        knock = rng.random(len(ys)) < loops
+        tiles[ys[knock] + 1, xs[knock] + 1] = FLOOR
+        return cls(tiles)
+
+    def save(self, path):
+        """
+        Writes the map in the binary format.
+        """
+        spawns = [(letter, x, y) for letter, tiles in self.spawns.items() for x, y in tiles]
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, self.width, self.height))
+            file.write(self.tiles.tobytes())
+            file.write(COUNT.pack(len(spawns)))
+            file.write(b''.join(SPAWN.pack(letter.encode(), x, y) for letter, x, y in spawns))
+
+    def spawn(self, letter):
+        """
+        Returns the first spawn tile marked by the letter, or the first floor tile if the map has none.
+        """
+        if self.spawns.get(letter):
+            return self.spawns[letter][0]
+        ys, xs = np.nonzero(self.tiles != WALL)
+        return int(xs[0]), int(ys[0])
+
+    def is_wall(self, x, y):
+        """
+        Tells whether tile (x, y) is a wall. Tiles outside the map are walls.
+        """
+        return not (0 <= x < self.width and 0 <= y < self.height) or self.tiles[y, x] == WALL
+
+    def blocked(self, x, y):
+        """
+        Tells whether an object of one tile size standing at (x, y), maybe between tiles, touches a wall.
+        """
+        x0, y0 = floor(x), floor(y)
+        x1, y1 = floor(x + 0.999), floor(y + 0.999)
+        return self.is_wall(x0, y0) or self.is_wall(x1, y0) or self.is_wall(x0, y1) or self.is_wall(x1, y1)
+
+    def prerender(self, tile_size, wall, ground=(128, 128, 128)):
+        """
+        Draws the static layer, the floor and all walls, into the cached surface.
+        :param wall: image of a wall tile
+        :param ground: background image or fill color of the floor
+        """
+        surface = pygame.Surface((self.width * tile_size, self.height * tile_size))
+        if isinstance(ground, pygame.Surface):
+            surface.blit(ground, (0, 0))
+        else:
+            surface.fill(ground)
+        ys, xs = np.nonzero(self.tiles == WALL)
+        surface.blits([(wall, (x * tile_size, y * tile_size)) for x, y in zip(xs.tolist(), ys.tolist())],
+                      doreturn=False)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        self.surface = surface
+        return surface
+
+    def draw(self, scr):
+        scr.blit(self.surface, (0, 0))
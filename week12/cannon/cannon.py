@@ -1,9 +1,17 @@
 import math
+import os
+import sys
 import pygame
 
 import random as rnd
 
 from my_colors import *
+from physics import move_targets, collide_targets
+
+# the loop runner is shared by the games, its one copy lives with the week13 game;
+# appended, so the modules of this folder come first
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'week13'))
+from loop_runner import LoopRunner
 
 FPS = 20
 GRAVITY_ACCELERATION = 9.8  # Gravitational acceleration for the projectile.
@@ -84,6 +92,8 @@ class Target:
 
     def __init__(self, x, y, Vx, Vy):
         self.x, self.y = x, y
+        # position before the last tick, drawing interpolates from it
+        self.prev_x, self.prev_y = x, y
         self.Vx, self.Vy = Vx, Vy
         self.r = Target.standard_radius
         self.color = COLORS[rnd.randint(0, len(COLORS) - 1)]
@@ -96,24 +106,26 @@ class Target:
         :param dt:
             :return:
         """
-        ax, ay = 0, GRAVITY_ACCELERATION
-        self.x += self.Vx * dt
-        self.y += self.Vy * dt
-        self.Vx += ax * dt
-        self.Vy += ay * dt
-        #todo: Target balls should bounce off the walls.
+        # the same step as all the targets make at once in the game loop
+        move_targets([self], dt, GRAVITY_ACCELERATION, SCREEN_WIDTH, SCREEN_HEIGHT)
 
-    def draw(self):
-        pygame.draw.circle(screen, self.color,
-                           (int(round(self.x)), int(round(self.y))), self.r)
+    def draw(self, alpha=1):
+        """
+        Draws the target alpha of the way from its previous position to the current one.
+        :param alpha: share of the tick passed, from 0 to 1
+        :return: None
+        """
+        x = self.prev_x + alpha * (self.x - self.prev_x)
+        y = self.prev_y + alpha * (self.y - self.prev_y)
+        pygame.draw.circle(screen, self.color, (int(round(x)), int(round(y))), self.r)
 
     def collide(self, other):
         """
          Calculation of absolutely elastic collision
-        :param other:
-        :return:
+        :param other: another target ball
+        :return: None
         """
-        pass  #todo
+        collide_targets([self, other])
 
 class Bomb:
     pass
@@ -134,26 +146,31 @@ def game_main_loop():
 
     targets = generate_random_targets(10)
 
-    clock = pygame.time.Clock()
-    finished = False
+    # input, FPS simulation ticks per second and rendering run as separate asyncio tasks
+    runner = LoopRunner(tick_rate=FPS, fps=60)
 
-    while not finished:
-        dt = clock.tick(FPS) / 1000
-        print(dt)
-        for event in pygame.event.get():
+    def handle(events):
+        finished = False
+        for event in events:
             if event.type == pygame.QUIT:
                 finished = True
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 print('Click!')
+        return finished
 
-        pygame.display.update()
-        screen.fill(GRAY)
-
+    def tick():
         for target in targets:
-            target.move(dt)
+            target.prev_x, target.prev_y = target.x, target.y
+        # all the targets move, bounce and collide in one vectorized step
+        move_targets(targets, runner.dt, GRAVITY_ACCELERATION, SCREEN_WIDTH, SCREEN_HEIGHT)
 
+    def draw(alpha):
+        screen.fill(GRAY)
         for target in targets:
-            target.draw()
+            target.draw(alpha)
+        pygame.display.update()
+
+    runner.start(handle, tick, draw)
 
     pygame.quit()
 
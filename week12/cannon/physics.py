@@ -0,0 +1,177 @@
+import numpy as np
+
+
+def sweep_and_prune(x, y, r):
+    """
+    Broad phase. Sorts the balls by the left ends of their x-intervals [x - r, x + r],
+    so the balls that a ball can touch follow it in the sorted order until the first one
+    that starts to the right of its interval.
+    :param x, y, r: arrays of coordinates and radii
+    :return: index arrays (i, j) of the pairs whose x- and y-intervals overlap
+    """
+    order = np.argsort(x - r, kind='stable')
+    left = (x - r)[order]
+    right = (x + r)[order]
+    # every ball is paired with the following balls which start inside its interval
+    stop = np.searchsorted(left, right, side='right')
+    start = np.arange(len(x)) + 1
+    count = np.maximum(stop - start, 0)
+    total = count.sum()
+    if total == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    i = np.repeat(np.arange(len(x)), count)
+    offset = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+    j = np.repeat(start, count) + offset
+    i, j = order[i], order[j]
+    overlap_y = np.abs(y[i] - y[j]) <= r[i] + r[j]
+    return i[overlap_y], j[overlap_y]
+
+
+def independent_groups(i, j, n):
+    """
+    Splits pairs into groups in which no ball appears twice. The pairs of a group can be resolved
+    at once exactly as if one by one, and a group sees the results of the groups before it.
+    :param i, j: index arrays of the pairs
+    :param n: number of balls
+    :return: list of index arrays into i and j
+    """
+    left = np.arange(len(i))
+    # pairs get random priorities, always the same ones, taking pairs in index order would make long chains wait
+    priority = np.random.default_rng(0).permutation(len(i))
+    best = np.empty(n, dtype=np.int64)
+    groups = []
+    while len(left):
+        # a pair goes into the group if it comes first among the pairs left of both its balls
+        p, li, lj = priority[left], i[left], j[left]
+        best[li] = len(i)
+        best[lj] = len(i)
+        np.minimum.at(best, li, p)
+        np.minimum.at(best, lj, p)
+        free = (best[li] == p) & (best[lj] == p)
+        groups.append(left[free])
+        left = left[~free]
+    return groups
+
+
+def resolve_collisions(pos, vel, r, mass, iterations=4):
+    """
+    Narrow phase and absolutely elastic collision of all touching pairs.
+    The balls of a pair are pushed apart and get equal and opposite impulses along the line
+    of their centers, so momentum and kinetic energy are conserved. Pairs are resolved in groups
+    without shared balls, one group after another, and the groups are gone through again
+    while some pair still approaches, at most iterations times.
+    :param pos, vel: (n, 2) arrays of coordinates and velocities, changed in place
+    :param r, mass: arrays of radii and masses
+    :return: number of pairs that collided
+    """
+    i, j = sweep_and_prune(pos[:, 0], pos[:, 1], r)
+    delta = pos[j] - pos[i]
+    dist2 = (delta**2).sum(axis=1)
+    touch = dist2 <= (r[i] + r[j])**2
+    i, j, delta, dist2 = i[touch], j[touch], delta[touch], dist2[touch]
+    if len(i) == 0:
+        return 0
+    dist = np.sqrt(dist2)
+    # balls in the same place are pushed apart along x
+    normal = np.where(dist[:, None] > 0, delta / np.where(dist > 0, dist, 1)[:, None], [1.0, 0.0])
+    inv = 1 / mass
+    inv_i = inv[i]
+    inv_j = inv[j]
+    # positional correction, the lighter ball moves more; a ball touching several others
+    # gets the average of their pushes, so crowds stay stable
+    contacts = np.bincount(np.concatenate([i, j]), minlength=len(pos))
+    depth = (r[i] + r[j] - dist) / (inv_i + inv_j)
+    np.add.at(pos, i, -(depth * inv_i / contacts[i])[:, None] * normal)
+    np.add.at(pos, j, (depth * inv_j / contacts[j])[:, None] * normal)
+    groups = independent_groups(i, j, len(pos))
+    for iteration in range(iterations):
+        approached = False
+        for group in groups:
+            a, b, n = i[group], j[group], normal[group]
+            # only the pairs that approach each other exchange momentum
+            approach = ((vel[b] - vel[a]) * n).sum(axis=1)
+            hit = approach < 0
+            if not hit.any():
+                continue
+            approached = True
+            a, b, n = a[hit], b[hit], n[hit]
+            impulse = -2 * approach[hit] / (inv[a] + inv[b])
+            # no ball appears twice in a group, so plain indexing adds every impulse
+            vel[a] -= (impulse * inv[a])[:, None] * n
+            vel[b] += (impulse * inv[b])[:, None] * n
+        if not approached:
+            break
+    return len(i)
+
+
+def reflect_walls(pos, vel, r, width, height):
+    """
+    Makes the balls bounce off the walls of the screen.
+    :param pos, vel: (n, 2) arrays of coordinates and velocities, changed in place
+    :param r: array of radii
+    :return: None
+    """
+    for axis, size in enumerate((width, height)):
+        low = r
+        high = size - r
+        hit_low = (pos[:, axis] < low) & (vel[:, axis] < 0)
+        hit_high = (pos[:, axis] > high) & (vel[:, axis] > 0)
+        pos[:, axis] = np.minimum(np.maximum(pos[:, axis], low), high)
+        vel[:, axis] = np.where(hit_low | hit_high, -vel[:, axis], vel[:, axis])
+
+
+def pack(targets):
+    """
+    Copies the targets into arrays.
+    :param targets: list of objects with fields x, y, Vx, Vy, r
+    :return: (n, 2) arrays of coordinates and velocities and an array of radii
+    """
+    pos = np.array([(t.x, t.y) for t in targets], dtype=float)
+    vel = np.array([(t.Vx, t.Vy) for t in targets], dtype=float)
+    r = np.array([t.r for t in targets], dtype=float)
+    return pos, vel, r
+
+
+def unpack(targets, pos, vel):
+    """
+    Copies coordinates and velocities back into the targets.
+    """
+    for t, (x, y), (vx, vy) in zip(targets, pos.tolist(), vel.tolist()):
+        t.x, t.y = x, y
+        t.Vx, t.Vy = vx, vy
+
+
+def collide_targets(targets):
+    """
+    Collides the touching target balls with each other, without moving them in time.
+    :param targets: list of objects with fields x, y, Vx, Vy, r
+    :return: number of pairs that collided
+    """
+    if not targets:
+        return 0
+    pos, vel, r = pack(targets)
+    # mass of a flat ball grows with its area
+    collided = resolve_collisions(pos, vel, r, r**2)
+    unpack(targets, pos, vel)
+    return collided
+
+
+def move_targets(targets, dt, gravity, width, height):
+    """
+    Moves all target balls by one time quantum dt, bounces them off the walls
+    and off each other.
+    :param targets: list of objects with fields x, y, Vx, Vy, r
+    :return: number of pairs that collided
+    """
+    if not targets:
+        return 0
+    pos, vel, r = pack(targets)
+    pos += vel * dt
+    vel[:, 1] += gravity * dt
+    reflect_walls(pos, vel, r, width, height)
+    # mass of a flat ball grows with its area
+    collided = resolve_collisions(pos, vel, r, r**2)
+    reflect_walls(pos, vel, r, width, height)
+    unpack(targets, pos, vel)
+    return collided
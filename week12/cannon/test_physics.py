@@ -0,0 +1,71 @@
+import numpy as np
+
+from physics import resolve_collisions, collide_targets
+
+
+def momentum(vel, mass):
+    return (mass[:, None] * vel).sum(axis=0)
+
+
+def energy(vel, mass):
+    return (mass * (vel**2).sum(axis=1)).sum() / 2
+
+
+def test_cradle():
+    """
+    A ball running into two resting balls of the same mass in a row stops,
+    and the last ball leaves with its velocity, like in Newton's cradle.
+    """
+    pos = np.array([[0.0, 0.0], [19.9, 0.0], [39.8, 0.0]])
+    vel = np.array([[10.0, 0.0], [0.0, 0.0], [0.0, 0.0]])
+    r = np.full(3, 10.0)
+    resolve_collisions(pos, vel, r, r**2)
+    assert np.allclose(vel, [[0, 0], [0, 0], [10, 0]])
+
+
+def test_pile_conserves_momentum_and_energy(n=3000, seed=0):
+    """
+    Collides a dense pile of balls of different masses, most of which touch several others.
+    """
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2)) * [800, 600]
+    vel = rng.normal(0, 20, (n, 2))
+    r = rng.uniform(3, 12, n)
+    mass = r**2
+    p0, e0 = momentum(vel, mass), energy(vel, mass)
+    assert resolve_collisions(pos, vel, r, mass) > 0
+    assert np.allclose(momentum(vel, mass), p0, rtol=0, atol=1e-6 * np.abs(mass[:, None] * vel).sum())
+    assert np.isclose(energy(vel, mass), e0, rtol=1e-9)
+
+
+class Ball:
+    def __init__(self, x, y, Vx, Vy, r):
+        self.x, self.y = x, y
+        self.Vx, self.Vy = Vx, Vy
+        self.r = r
+
+
+def test_collide_targets_conserves_momentum_and_energy():
+    """
+    Two target balls of different sizes hitting each other off center, as Target.collide does it.
+    """
+    a = Ball(100, 100, 10, 3, 15)
+    b = Ball(120, 108, -20, 0, 10)
+    vel = lambda: np.array([(a.Vx, a.Vy), (b.Vx, b.Vy)])
+    mass = np.array([a.r**2, b.r**2])
+    p0, e0 = momentum(vel(), mass), energy(vel(), mass)
+    assert collide_targets([a, b]) == 1
+    assert not np.allclose(vel(), [(10, 3), (-20, 0)])
+    assert np.allclose(momentum(vel(), mass), p0)
+    assert np.isclose(energy(vel(), mass), e0)
+    # the balls still touch, but fly apart, so their velocities stay as they are
+    after = vel()
+    collide_targets([a, b])
+    assert np.array_equal(vel(), after)
+
+
+if __name__ == "__main__":
+    test_cradle()
+    test_pile_conserves_momentum_and_energy()
+    test_collide_targets_conserves_momentum_and_energy()
+    print('ok')
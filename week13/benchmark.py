@@ -0,0 +1,287 @@
+import argparse
+import functools
+import json
+import math
+import os
+import random
+import time
+
+# benchmarks draw on offscreen surfaces only, no window is needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame as pg
+
+from cannon import Manager, Shell, Target, MovingTargets, Bomb, SCREEN_SIZE
+from projectiles import ShellPool
+
+SIZES = [10, 1000, 100000]
+# medians measured on the development machine, refreshed with --save-baseline
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+def arena(n):
+    '''
+    Returns the size of an area holding n objects as densely as 10 objects fill the screen,
+    so that collision work grows with n and not with n squared.
+    '''
+    scale = math.sqrt(max(n, 10) / 10)
+    return SCREEN_SIZE[0] * scale, SCREEN_SIZE[1] * scale
+
+
+def random_shells(n, bounds=SCREEN_SIZE):
+    return [Shell([randint_f(20, bounds[0] - 20), randint_f(20, bounds[1] - 20)],
+                  [random.randint(-30, 30), random.randint(-30, 30)]) for i in range(n)]
+
+
+def randint_f(a, b):
+    return random.randint(int(a), int(b))
+
+
+def fill_pool(pool, shells):
+    for shell in shells:
+        pool.append(shell)
+
+
+def random_targets(n, bounds=SCREEN_SIZE):
+    targets = []
+    for i in range(n):
+        coord = [randint_f(30, bounds[0] - 30), randint_f(30, bounds[1] - 30)]
+        cls = MovingTargets if i % 2 else Target
+        targets.append(cls(coord=coord, rad=random.randint(5, 30)))
+    return targets
+
+
+def bench_shell_move(n):
+    '''
+    Shell.move and check_corners, one object at a time.
+    '''
+    shells = random_shells(n)
+    state = [(list(shell.coord), list(shell.vel)) for shell in shells]
+
+    def reset():
+        for shell, (coord, vel) in zip(shells, state):
+            shell.coord[:] = coord
+            shell.vel[:] = vel
+
+    def run():
+        for shell in shells:
+            shell.move(grav=2)
+    return run, reset
+
+
+def bench_pool_move(n, integrator=None):
+    '''
+    ShellPool.move, all shells in one vectorized step, optionally with a float integrator.
+    '''
+    pool = ShellPool(SCREEN_SIZE, integrator=integrator)
+    fill_pool(pool, random_shells(n))
+    coord = pool.coord.copy()
+    vel = pool.vel.copy()
+
+    def reset():
+        pool.coord[:] = coord
+        pool.vel[:] = vel
+        pool.alive[:pool.n] = True
+
+    def run():
+        pool.move(grav=2)
+    return run, reset
+
+
+def bench_manager_move(n):
+    '''
+    Manager.move with n balls, n enemy balls and n targets.
+    '''
+    mgr = Manager(n_targets=0)
+    fill_pool(mgr.balls, random_shells(n))
+    fill_pool(mgr.enemy_balls, random_shells(n))
+    targets = random_targets(n)
+    saved = [(pool, pool.n, pool.coord.copy(), pool.vel.copy(), list(pool.color), list(pool.sides))
+             for pool in (mgr.balls, mgr.enemy_balls)]
+    coords = [list(target.coord) for target in targets]
+
+    def reset():
+        for pool, count, coord, vel, color, sides in saved:
+            pool.n = count
+            pool.coord[:count] = coord[:count]
+            pool.vel[:count] = vel[:count]
+            pool.alive[:count] = True
+            pool.color = list(color)
+            pool.sides = list(sides)
+        for target, coord in zip(targets, coords):
+            target.coord[:] = coord
+        mgr.targets = list(targets)
+        mgr.motion.clear()
+        mgr.motion.add([target for target in targets if target.moving])
+
+    def run():
+        mgr.move()
+    return run, reset
+
+
+def bench_collide(n):
+    '''
+    Manager.collide with n balls against n targets spread over the arena.
+    '''
+    bounds = arena(n)
+    mgr = Manager(n_targets=0)
+    mgr.balls = ShellPool(bounds)
+    fill_pool(mgr.balls, random_shells(n, bounds))
+    targets = random_targets(n, bounds)
+    bombs = [Bomb(coord=target.coord) for target in targets]
+
+    def reset():
+        mgr.targets = list(targets)
+        mgr.bombs = list(bombs)
+        Bomb.free.clear()
+
+    def run():
+        mgr.collide()
+    return run, reset
+
+
+def bench_target_draw(n):
+    '''
+    Target.draw of n targets on an offscreen surface.
+    '''
+    screen = pg.Surface(SCREEN_SIZE)
+    targets = random_targets(n)
+
+    def run():
+        for target in targets:
+            target.draw(screen)
+    return run, None
+
+
+def bench_shell_draw(n):
+    '''
+    ShellPool.draw of n shells on an offscreen surface.
+    '''
+    screen = pg.Surface(SCREEN_SIZE)
+    pool = ShellPool(SCREEN_SIZE)
+    fill_pool(pool, random_shells(n))
+
+    def run():
+        pool.draw(screen)
+    return run, None
+
+
+def bench_new_mission(n):
+    '''
+    Manager.new_mission creating n targets and their bombs.
+    '''
+    mgr = Manager(n_targets=max(1, n // 2))
+
+    def reset():
+        mgr.targets = []
+        mgr.bombs = []
+        mgr.motion.clear()
+        Bomb.free.clear()
+
+    def run():
+        mgr.new_mission()
+    return run, reset
+
+
+BENCHMARKS = {
+    'shell_move': bench_shell_move,
+    'pool_move': bench_pool_move,
+    'pool_move_euler': functools.partial(bench_pool_move, integrator='euler'),
+    'pool_move_verlet': functools.partial(bench_pool_move, integrator='verlet'),
+    'pool_move_rk4': functools.partial(bench_pool_move, integrator='rk4'),
+    'manager_move': bench_manager_move,
+    'collide': bench_collide,
+    'target_draw': bench_target_draw,
+    'shell_draw': bench_shell_draw,
+    'new_mission': bench_new_mission,
+}
+
+
+def measure(run, reset, budget=1.0, max_repeat=200):
+    '''
+    Times run() until the time budget is spent, at least 5 times, resetting the state before each call.
+    Returns a list of call durations in seconds.
+    '''
+    samples = []
+    spent = 0
+    while len(samples) < 5 or (spent < budget and len(samples) < max_repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed)
+        spent += elapsed
+    return samples
+
+
+def run_suite(names, sizes, budget=1.0, seed=0):
+    '''
+    Runs the benchmarks and returns a dict "name[n]" -> latency percentiles in ms and throughput.
+    '''
+    results = {}
+    for name in names:
+        for n in sizes:
+            random.seed(seed)
+            run, reset = BENCHMARKS[name](n)
+            samples = np.array(measure(run, reset, budget))
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            results['{}[{}]'.format(name, n)] = {
+                'n': n, 'calls': len(samples),
+                'p50_ms': 1000 * p50, 'p95_ms': 1000 * p95, 'p99_ms': 1000 * p99,
+                'objects_per_s': n / p50}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Prints every result next to its baseline. Returns names of the results whose median latency
+    grew by more than tolerance.
+    '''
+    regressions = []
+    print('{:24} {:>8} {:>10} {:>10} {:>10} {:>14} {:>9}'.format(
+        'benchmark', 'calls', 'p50 ms', 'p95 ms', 'p99 ms', 'objects/s', 'vs base'))
+    for key, r in results.items():
+        change = 'new'
+        if key in baseline:
+            ratio = r['p50_ms'] / baseline[key]['p50_ms']
+            change = '{:+.0%}'.format(ratio - 1)
+            if ratio > 1 + tolerance:
+                regressions.append(key)
+                change += ' !'
+        print('{:24} {:8d} {:10.3f} {:10.3f} {:10.3f} {:14.0f} {:>9}'.format(
+            key, r['calls'], r['p50_ms'], r['p95_ms'], r['p99_ms'], r['objects_per_s'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the cannon game subsystems.')
+    parser.add_argument('names', nargs='*', default=list(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--budget', type=float, default=1.0, help='seconds spent on every benchmark')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='stores the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown of the median')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    elif not args.save_baseline:
+        # without a baseline every run would pass
+        parser.error('no baseline in {}, make one first with --save-baseline'.format(args.baseline))
+    results = run_suite(args.names, args.sizes, args.budget)
+    regressions = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=1)
+    if regressions:
+        print('slower than the baseline: ' + ', '.join(regressions))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
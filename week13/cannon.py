@@ -1,8 +1,19 @@
+import argparse
 import numpy as np
 import pygame as pg
 import math
 import random
 from random import randint, gauss
+from projectiles import ShellPool
+from spatial import SpatialHash, time_of_impact
+import trajectory
+from firing_table import FiringTable
+from render_cache import shape_cache
+from dirty_renderer import DirtyRenderer
+from replay import Recorder
+from profiler import FrameProfiler
+from motion import TargetMotion
+from loop_runner import LoopRunner
 
 pg.init()
 pg.font.init()
@@ -11,11 +22,36 @@ BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 SCREEN_SIZE = (800, 600)
+# groups of bodies in the grid of Manager.collide
+BALL, ENEMY_BALL, TARGET = range(3)
 
 def rand_color():
     return (randint(0, 255), randint(0, 255), randint(0, 255))
 
 class GameObject:
+    __slots__ = ()
+    # classes that are created and thrown away a lot keep their released objects here
+    free = None
+    max_free = 1024
+
+    @classmethod
+    def new(cls, *args, **kwargs):
+        '''
+        Returns a released object of the class initialized again with the arguments,
+        or a brand new one if there's none to reuse.
+        '''
+        if cls.free:
+            obj = cls.free.pop()
+            obj.__init__(*args, **kwargs)
+            return obj
+        return cls(*args, **kwargs)
+
+    def release(self):
+        '''
+        Gives the object back to its class to be reused by new(). The object must not be used after that.
+        '''
+        if self.free is not None and len(self.free) < self.max_free:
+            self.free.append(self)
 
     def move(self):
         pass
@@ -31,6 +67,8 @@ class Shell(GameObject):
     # we added a sides variable to implement various types of projectiles
     # the number of sides is a random number between 0 and 4
     # 0,1,2 will draw a circle, 3 will draw a triangular shape, 4 will draw a square/rectangle
+    __slots__ = ('coord', 'vel', 'color', 'rad', 'sides', 'is_alive')
+    free = []
 
     def __init__(self, coord, vel, rad = 20, color = None, sides = 0):
         '''
@@ -75,15 +113,14 @@ class Shell(GameObject):
         '''
         Draws the shell on appropriate surface.
         '''
-        # checks what to draw depending on number of sides
-        # 0,1,2 will draw a circle, 3 will draw a triangular shape, 4 will draw a square/rectangle
+        # the shape depending on number of sides is rasterized once and then only blitted
+        screen.blit(*self.sprite())
 
-        if self.sides == 4:
-            pg.draw.polygon(screen, self.color, self.get_square_points())
-        elif self.sides == 3:
-            pg.draw.polygon(screen, self.color, self.get_polygon_points(), self.rad)
-        else:
-            pg.draw.circle(screen, self.color, self.coord, self.rad)
+    def sprite(self):
+        '''
+        Returns the cached (surface, position) pair of the shape.
+        '''
+        return shape_cache.item(self.sides, self.rad, self.color, self.coord)
 
     # here we create a function to define the points of a square/rectangle if the number of sides is 4
     # we store the coordinates in a list of tuples
@@ -122,6 +159,9 @@ class Bomb (GameObject):
     '''
     Bomb class. Creates bombs, manages their movement and collision with the user's cannon.
     '''
+    __slots__ = ('coord', 'vel', 'rad', 'color', 'is_alive')
+    free = []
+
     def __init__(self, coord=None, vel=None, rad=10, color=RED):
         if coord is None:
             coord = [randint(rad, SCREEN_SIZE[0] - rad), 0]
@@ -146,26 +186,37 @@ class Bomb (GameObject):
         '''
         Checks if the bomb collides with the user's cannon.
         '''
-        dist = sum([(self.coord[i] - cannon.coord[i])**2 for i in range(2)])**0.5
-        min_dist = self.rad + cannon.rad
-        return dist <= min_dist
+        dist2 = (self.coord[0] - cannon.coord[0])**2 + (self.coord[1] - cannon.coord[1])**2
+        return dist2 <= (self.rad + cannon.rad)**2
 
     def draw(self, screen):
         '''
         Draws the bomb on the screen.
         '''
-        pg.draw.circle(screen, self.color, self.coord, self.rad) 
+        screen.blit(*self.sprite())
+
+    def sprite(self, alpha=1):
+        '''
+        Returns the cached (surface, position) pair of the bomb, alpha of the way from its previous position.
+        '''
+        # the velocity is constant, so the previous position is one step back
+        coord = [self.coord[i] - (1 - alpha) * self.vel[i] for i in range(2)]
+        return shape_cache.item(0, self.rad, self.color, coord)
 
 
 class Cannon(GameObject):
     '''
     Cannon class. Manages it's renderring, movement and striking.
     '''
+    # radius of the circle in which enemy balls and bombs hit the gun
+    rad = 10
+
     def __init__(self, coord=[30, SCREEN_SIZE[1]//2], angle=0, max_pow=50, min_pow=10, color=RED):
         '''
         Constructor method. Sets coordinate, direction, minimum and maximum power and color of the gun.
         '''
-        self.coord = coord
+        # a copy, so that moving one gun doesn't move the default position of the next game's gun
+        self.coord = list(coord)
         self.angle = angle
         self.max_pow = max_pow
         self.min_pow = min_pow
@@ -192,7 +243,8 @@ class Cannon(GameObject):
         '''
         vel = self.pow
         angle = self.angle
-        ball = Shell(list(self.coord), [int(vel * np.cos(angle)), int(vel * np.sin(angle))])
+        vx, vy = trajectory.launch_velocity(angle, vel)
+        ball = Shell.new(list(self.coord), [int(vx), int(vy)])
         self.pow = self.min_pow
         self.active = False
         self.last_user_shot_time = pg.time.get_ticks()
@@ -202,7 +254,23 @@ class Cannon(GameObject):
         '''
         Sets gun's direction to target position.
         '''
-        self.angle = np.arctan2(target_pos[1] - self.coord[1], target_pos[0] - self.coord[0])
+        self.angle = self.angle_to(target_pos)
+
+    def angle_to(self, target_pos):
+        '''
+        Returns the direction from the gun to target position.
+        '''
+        return np.arctan2(target_pos[1] - self.coord[1], target_pos[0] - self.coord[0])
+
+    def predict(self, angles, powers, targets=(), grav=2):
+        '''
+        Solves trajectories of candidate shots from the gun's position all at once.
+        Returns landing points, time of flight and first target hit, see trajectory.solve.
+        '''
+        coords = [target.coord for target in targets]
+        rads = [target.rad for target in targets]
+        return trajectory.solve(angles, powers, self.coord, SCREEN_SIZE, grav=grav,
+                                targets=coords, target_rad=rads)
 
         # created separate functions for vertical and horizontal movement of the cannon
     def verticalMove(self, inc):
@@ -218,22 +286,32 @@ class Cannon(GameObject):
         '''
         Draws the gun on the screen.
         '''
-        
+        pg.draw.polygon(screen, self.color, self.get_shape_points())
+
+    def get_shape_points(self, angle=None):
+        '''
+        Helper method to calculate the points of the gun's polygon, turned to angle if it's given.
+        '''
+        if angle is None:
+            angle = self.angle
         gun_shape = []
-        vec_1 = np.array([int(5*np.cos(self.angle - np.pi/2)), int(5*np.sin(self.angle - np.pi/2))])
-        vec_2 = np.array([int(self.pow*np.cos(self.angle)), int(self.pow*np.sin(self.angle))])
+        vec_1 = np.array([int(5*np.cos(angle - np.pi/2)), int(5*np.sin(angle - np.pi/2))])
+        vec_2 = np.array([int(self.pow*np.cos(angle)), int(self.pow*np.sin(angle))])
         gun_pos = np.array(self.coord)
         gun_shape.append((gun_pos + vec_1).tolist())
         gun_shape.append((gun_pos + vec_1 + vec_2).tolist())
         gun_shape.append((gun_pos + vec_2 - vec_1).tolist())
         gun_shape.append((gun_pos - vec_1).tolist())
-        pg.draw.polygon(screen, self.color, gun_shape)
+        return gun_shape
 
 
 class Target(GameObject):
     '''
     Target class. Creates target, manages it's rendering and collision with a ball event.
     '''
+    # moving targets are moved all at once by motion.TargetMotion
+    moving = False
+
     def __init__(self, coord=None, color=None, rad=30, sides = 0):
         '''
         Constructor method. Sets coordinate, color and radius of the target.
@@ -241,6 +319,8 @@ class Target(GameObject):
         if coord == None:
             coord = [randint(rad, SCREEN_SIZE[0] - rad), randint(rad, SCREEN_SIZE[1] - rad)]
         self.coord = coord
+        # position before the last tick, the same list as long as the target doesn't move
+        self.prev = coord
         self.rad = rad
         self.sides = randint(0, 4)
 
@@ -253,23 +333,24 @@ class Target(GameObject):
         '''
         Checks whether the ball bumps into target.
         '''
-        dist = sum([(self.coord[i] - ball.coord[i])**2 for i in range(2)])**0.5
-        min_dist = self.rad + ball.rad
-        return dist <= min_dist
+        dist2 = (self.coord[0] - ball.coord[0])**2 + (self.coord[1] - ball.coord[1])**2
+        return dist2 <= (self.rad + ball.rad)**2
 
     def draw(self, screen):
         '''
         Draws the target on the screen
         '''
-        # checks what to draw depending on number of sides
-        # 0,1,2 will draw a circle, 3 will draw a triangular shape, 4 will draw a square/rectangle
+        # the shape depending on number of sides is rasterized once and then only blitted
+        screen.blit(*self.sprite())
 
-        if self.sides == 4:
-            pg.draw.polygon(screen, self.color, self.get_square_points())
-        elif self.sides == 3:
-            pg.draw.polygon(screen, self.color, self.get_polygon_points(), self.rad)
-        else:
-            pg.draw.circle(screen, self.color, self.coord, self.rad)
+    def sprite(self, alpha=1):
+        '''
+        Returns the cached (surface, position) pair of the shape, alpha of the way from its previous position.
+        '''
+        coord = self.coord
+        if alpha != 1 and self.prev is not coord:
+            coord = [self.prev[i] + alpha * (coord[i] - self.prev[i]) for i in range(2)]
+        return shape_cache.item(self.sides, self.rad, self.color, coord)
 
     # here we create a function to define the points of a square/rectangle if the number of sides is 4
     # we store the coordinates in a list of tuples
@@ -315,10 +396,39 @@ class EnemyCannon(Cannon):
     '''
     EnemyCannon class. Inherits methods from Cannon
     '''
-    def __init__(self, coord=[SCREEN_SIZE[0]-30, SCREEN_SIZE[1]//2], angle=0, max_pow=50, min_pow=10, color=BLUE):
+    # firing solutions are shared by all enemy cannons
+    firing_table = None
+
+    def __init__(self, coord=[SCREEN_SIZE[0]-30, SCREEN_SIZE[1]//2], angle=0, max_pow=50, min_pow=10, color=BLUE,
+                 aiming=False):
         super().__init__(coord, angle, max_pow, min_pow, color)
         #changed power to enemy cannon to 35
         self.pow = 35
+        # with aiming on, the cannon shoots at the user's cannon instead of straight back
+        self.aiming = aiming
+        if aiming:
+            # the tables of all the origin cells are built once, before the game starts,
+            # so no shot has to search for its solution in the middle of a frame
+            self.solutions().precompute()
+
+    def solutions(self):
+        '''
+        Returns the firing table shared by the enemy cannons, created on first use.
+        '''
+        if EnemyCannon.firing_table is None:
+            EnemyCannon.firing_table = FiringTable(SCREEN_SIZE, self.min_pow, self.max_pow)
+        return EnemyCannon.firing_table
+
+    def aim(self, target_pos):
+        '''
+        Looks up the angle and power of a shot that reaches target position. Returns False
+        if there's no such shot.
+        '''
+        solution = self.solutions().lookup(self.coord, target_pos)
+        if solution is None:
+            return False
+        self.angle, self.pow = solution
+        return True
 
     '''
     Enemy Cannon Movement function that makes the cannon go either vertical or horizontal after every user movement
@@ -331,15 +441,22 @@ class EnemyCannon(Cannon):
     def strike(self):
         vel = self.pow
         angle = self.angle
-        # adjussted the angle so it shoots towards the user cannon
-        ball = Shell(list(self.coord), [int(35 * np.cos(angle + 180)), int(35 * np.sin(angle + 180))])
+        if self.aiming:
+            vx, vy = trajectory.launch_velocity(angle, vel)
+            ball = Shell.new(list(self.coord), [int(vx), int(vy)])
+        else:
+            # adjussted the angle so it shoots towards the user cannon
+            ball = Shell.new(list(self.coord), [int(35 * np.cos(angle + 180)), int(35 * np.sin(angle + 180))])
         self.pow = self.min_pow
         self.active = False
         return ball
 
 class MovingTargets(Target):
+    moving = True
+
     def __init__(self, coord = None, color = None, rad = 30, sides = 0):
         super().__init__(coord, color, rad)
+        self.prev = list(self.coord)
         self.vx = randint(-2, +2)
         self.vy = randint(-2, +2)
         self.x_offset = randint(0, 360)
@@ -364,21 +481,46 @@ class MovingTargets(Target):
     # we generate a random integer between 0 and 1.
     # 1 = linear movement
     # 2 = accelerated movement
-    def move(self):
-        movement_type = randint(0, 1)
+    # TargetMotion draws the numbers of all targets at once and passes them in
+    def move(self, movement_type=None, bounds=SCREEN_SIZE):
+        if movement_type is None:
+            movement_type = randint(0, 1)
         if movement_type == 0:
             self.linearMovement()
         elif movement_type == 1:
             self.accelerateMovement()
+        self.bounce(bounds)
+
+    # the target bounces off the walls instead of leaving the screen, the same way as motion.bounce
+    def bounce(self, bounds=SCREEN_SIZE):
+        for i in range(2):
+            if self.coord[i] < self.rad or self.coord[i] > bounds[i] - self.rad:
+                self.coord[i] = min(max(self.coord[i], self.rad), bounds[i] - self.rad)
+                if i == 0:
+                    self.vx = -self.vx
+                else:
+                    self.vy = -self.vy
 
 class ScoreTable:
     '''
     Score table class.
     '''
-    def __init__(self, t_destr=0, b_used=0):
+    def __init__(self, t_destr=0, b_used=0, hits=0):
         self.t_destr = t_destr
         self.b_used = b_used
-        self.font = pg.font.SysFont("dejavusansmono", 25)
+        # times the user's gun was hit by enemy balls or bombs
+        self.hits = hits
+        # the font is loaded on first draw, so a headless game never touches it
+        self.font = None
+        # rendered text is kept until the numbers change
+        self.surfaces = []
+        self.rendered = None
+
+    def __getstate__(self):
+        # fonts and surfaces can't be copied, they are made again on the next draw
+        state = self.__dict__.copy()
+        state.update(font=None, surfaces=[], rendered=None)
+        return state
 
     def score(self):
         '''
@@ -386,13 +528,24 @@ class ScoreTable:
         '''
         return self.t_destr - self.b_used
 
+    def sprites(self):
+        '''
+        Returns (surface, position) pairs of the score lines. Text is rendered again only
+        when the numbers have changed since the last call.
+        '''
+        values = (self.t_destr, self.b_used, self.hits, self.score())
+        if values != self.rendered:
+            if self.font is None:
+                self.font = pg.font.SysFont("dejavusansmono", 25)
+            self.surfaces = [self.font.render("Destroyed: {}".format(self.t_destr), True, WHITE),
+                             self.font.render("Balls used: {}".format(self.b_used), True, WHITE),
+                             self.font.render("Hits taken: {}".format(self.hits), True, WHITE),
+                             self.font.render("Total: {}".format(self.score()), True, RED)]
+            self.rendered = values
+        return [(self.surfaces[i], (10, 10 + 30*i)) for i in range(len(self.surfaces))]
+
     def draw(self, screen):
-        score_surf = []
-        score_surf.append(self.font.render("Destroyed: {}".format(self.t_destr), True, WHITE))
-        score_surf.append(self.font.render("Balls used: {}".format(self.b_used), True, WHITE))
-        score_surf.append(self.font.render("Total: {}".format(self.score()), True, RED))
-        for i in range(3):
-            screen.blit(score_surf[i], [10, 10 + 30*i])
+        screen.blits(self.sprites(), doreturn=False)
 
 class Manager:
     '''
@@ -400,15 +553,29 @@ class Manager:
     '''
     last_user_shot_time = 0
 
-    def __init__(self, n_targets=1):
-        self.balls = []
-        self.enemy_balls = []
+    def __init__(self, n_targets=1, target_rad=None, enemy_aiming=False, continuous=False, integrator=None):
+        # shells live in structure-of-arrays pools, so they move in one vectorized step;
+        # with an integrator they move on floats in substeps, see ShellPool
+        self.balls = ShellPool(SCREEN_SIZE, integrator=integrator)
+        self.enemy_balls = ShellPool(SCREEN_SIZE, integrator=integrator)
         self.gun = Cannon()
-        self.enemy_cannon = EnemyCannon()
+        self.enemy_cannon = EnemyCannon(aiming=enemy_aiming)
         self.targets = []
         self.score_t = ScoreTable()
         self.n_targets = n_targets
+        # fixed radius of new targets, None means it depends on the score
+        self.target_rad = target_rad
         self.bombs = []
+        # moves the moving targets together, its generator is seeded from random so a seeded game repeats
+        self.motion = TargetMotion(SCREEN_SIZE, np.random.default_rng(random.getrandbits(64)))
+        self.grid = SpatialHash()
+        # with continuous collision balls are tested along their whole path of the tick,
+        # so fast balls can't jump over small targets
+        self.continuous = continuous
+        # number of pairs the last collide() had to test exactly
+        self.pairs_tested = 0
+        # optional FrameProfiler timing the phases of every frame
+        self.profiler = None
         self.new_mission()
         self.user_coord = None
 
@@ -416,33 +583,85 @@ class Manager:
         '''
         Adds new targets.
         '''
+        moving = []
         for i in range(self.n_targets):
-            self.targets.append(MovingTargets(rad=randint(max(1, 30 - 2*max(0, self.score_t.score())),
-                30 - max(0, self.score_t.score()))))
-            self.targets.append(Target(rad=randint(max(1, 30 - 2*max(0, self.score_t.score())),
-                30 - max(0, self.score_t.score()))))
+            moving.append(MovingTargets(rad=self.target_radius()))
+            self.targets.append(moving[-1])
+            self.targets.append(Target(rad=self.target_radius()))
+        self.motion.add(moving)
             
-        # bombs move until user shoots targets
-        
+        # every new target drops a bomb, which falls from where the target is
         for target in self.targets:
-            self.bombs.append(Bomb(coord=target.coord))
+            self.bombs.append(Bomb.new(coord=list(target.coord)))
+
+    def target_radius(self):
+        '''
+        Returns radius of a new target. Targets get smaller as the score grows, unless the radius is fixed.
+        '''
+        if self.target_rad is not None:
+            return self.target_rad
+        score = max(0, self.score_t.score())
+        return randint(max(1, 30 - 2*score), max(1, 30 - score))
 
-    def process(self, events, screen):
+    def process(self, events, screen=None):
         '''
         Runs all necessary method for each iteration. Adds new targets, if previous are destroyed.
+        Draws everything on screen, if it's given.
+        '''
+        aim = pg.mouse.get_pos() if pg.mouse.get_focused() else None
+        done = self.advance(events, aim)
+        if screen is not None:
+            self.draw(screen)
+
+        return done
+
+    def advance(self, events, aim=None):
+        '''
+        Handles the events, turns the gun to the aim position, if there's one, and makes a step,
+        unless the game was quit. Only uses its arguments as input, so a recorded game can be played again exactly.
         '''
+        if self.profiler is not None:
+            self.profiler.begin()
         done = self.handle_events(events)
-        if pg.mouse.get_focused():
-            mouse_pos = pg.mouse.get_pos()
-            self.gun.set_angle(mouse_pos)
-        
+        if done:
+            # the live game stops as soon as it's quit, so a replay ends in the same state
+            return done
+        if aim is not None:
+            self.gun.set_angle(aim)
+        if self.profiler is not None:
+            self.profiler.lap('events')
+        self.step()
+        return done
+
+    def step(self):
+        '''
+        Advances the game by one fixed tick: moves and collides everything and adds new targets,
+        if previous are destroyed. Doesn't need a display, so it can run headless.
+        '''
         self.move()
+        if self.profiler is not None:
+            self.profiler.lap('move')
         self.collide()
-        self.draw(screen)
         if len(self.targets) == 0 and len(self.balls) == 0:
             self.new_mission()
+        if self.profiler is not None:
+            self.profiler.lap('collide')
 
-        return done
+    def fire(self):
+        '''
+        Strikes with the user's gun and the enemy cannon at once.
+        '''
+        ball = self.gun.strike()
+        self.balls.append(ball)
+        # the pool copied the shell, so it's free for the next strike
+        ball.release()
+        # enemy cannon shoots every time user shoots
+        if self.enemy_cannon.aiming:
+            self.enemy_cannon.aim(self.gun.coord)
+        ball = self.enemy_cannon.strike()
+        self.enemy_balls.append(ball)
+        ball.release()
+        self.score_t.b_used += 1
 
     def handle_events(self, events):
         '''
@@ -469,104 +688,240 @@ class Manager:
                 elif event.key == pg.K_ESCAPE:
                     done = True
             elif event.type == pg.MOUSEBUTTONDOWN:
-                self.user_coord = pg.mouse.get_pos()
+                self.user_coord = event.pos
                 if event.button == 1:
                     self.gun.activate()
                     self.enemy_cannon.activate()
             elif event.type == pg.MOUSEBUTTONUP:
                 if event.button == 1:
-                    self.balls.append(self.gun.strike())
-                    # enemy cannon shoots every time user shoots
-                    self.enemy_balls.append(self.enemy_cannon.strike())
-                    self.score_t.b_used += 1
+                    # the shot goes where the gun is drawn, not where it was turned on the last tick
+                    self.gun.set_angle(event.pos)
+                    self.fire()
         return done
 
     def draw(self, screen):
         '''
         Runs balls', gun's, targets' and score table's drawing method.
         '''
-        for ball in self.balls:
-            ball.draw(screen)
-        # enemy_balls treated the same as user's balls
-        for ball in self.enemy_balls:
-            ball.draw(screen)
-        for target in self.targets:
-            target.draw(screen)
-        for bomb in self.bombs:
-            bomb.draw(screen)
+        # all the shapes are cached surfaces, so they go to the screen in one batch call
+        screen.blits(self.sprites(), doreturn=False)
         self.gun.draw(screen)
         self.enemy_cannon.draw(screen) 
         self.score_t.draw(screen)
 
+    def sprites(self, alpha=1):
+        '''
+        Returns (surface, position) pairs of balls, targets and bombs in drawing order.
+        Everything is interpolated alpha of the way from its previous position.
+        '''
+        sprites = self.balls.sprites(alpha)
+        # enemy_balls treated the same as user's balls
+        sprites += self.enemy_balls.sprites(alpha)
+        sprites += [target.sprite(alpha) for target in self.targets]
+        sprites += [bomb.sprite(alpha) for bomb in self.bombs]
+        return sprites
+
     def move(self):
         '''
         Runs balls' and gun's movement method, removes dead balls.
         '''
-        dead_balls = []
-        for i, ball in enumerate(self.balls):
-            ball.move(grav=2)
-            if not ball.is_alive:
-                dead_balls.append(i)
+        if len(self.balls):
+            self.balls.move(grav=2)
+            self.balls.remove_dead()
         # we want the enemy balls to move
-        for i, ball in enumerate(self.enemy_balls):
-            ball.move(grav=2)
-            if not ball.is_alive:
-                dead_balls.append(i)
-
-        for i in reversed(dead_balls):
-            self.balls.pop(i)
-            self.enemy_balls.pop(i)
-        for i, target in enumerate(self.targets):
-            target.move()
+        if len(self.enemy_balls):
+            self.enemy_balls.move(grav=2)
+            self.enemy_balls.remove_dead()
+        # moving targets are updated together, static ones stay where they are
+        self.motion.move()
+        self.handle_bombs()
         self.gun.gain()
 
-    def collide(self):
-        '''
-        Checks whether balls bump into targets, sets balls' alive trigger.
-        '''
-        # we do not have enemy balls here as we only want it to collide with the user's balls
-        collisions = []
-        targets_c = []
-        for i, ball in enumerate(self.balls):
-            for j, target in enumerate(self.targets):
-                if target.check_collision(ball):
-                    collisions.append([i, j])
-                    targets_c.append(j)
-        targets_c.sort()
-        for j in reversed(targets_c):
-            self.score_t.t_destr += 1
-            self.targets.pop(j)
-            self.bombs.pop(j)
-    
     def handle_bombs(self):
         '''
-        Handles bomb motion, collision, and removal.
+        Handles bomb motion and removal: bombs fall and are dropped when they leave the screen.
         '''
+        if not self.bombs:
+            return
+        falling = []
         for bomb in self.bombs:
             bomb.move()
-            if bomb.check_collision(self.user_cannon):
-                self.user_cannon_hit = True
-            if bomb.coord[1] > SCREEN_SIZE[1]:
-                self.bombs.remove(bomb)
-
-    
-screen = pg.display.set_mode(SCREEN_SIZE)
-pg.display.set_caption("The gun of Khiryanov")
-
-done = False
-clock = pg.time.Clock()
-
-mgr = Manager(n_targets=4)
-
-
-while not done:
-    
-    clock.tick(15)
-    screen.fill(BLACK)
-
-    done = mgr.process(pg.event.get(), screen)
-
-    pg.display.flip()
+            if bomb.coord[1] - bomb.rad > SCREEN_SIZE[1]:
+                bomb.release()
+            else:
+                falling.append(bomb)
+        self.bombs = falling
+
+    def ball_path(self, pool):
+        '''
+        Returns positions of the pool's balls at the start and the end of the tick.
+        Without continuous collisions only the end counts, the start is returned and the end is None.
+        '''
+        start, end = pool.path()
+        if not self.continuous:
+            return end, None
+        return start, end
+
+    def bodies(self):
+        '''
+        Returns positions at the start and the end of the tick, radii and group sizes of everything
+        that goes into the grid, in the order player balls, enemy balls, targets.
+        Only the balls move during collide(), targets stand still. The end is None unless
+        collisions are continuous, see ball_path().
+        '''
+        groups = []
+        for pool in (self.balls, self.enemy_balls):
+            start, end = self.ball_path(pool)
+            groups.append((start, end, pool.live()[1]))
+        coord = np.array([target.coord for target in self.targets], dtype=float).reshape(-1, 2)
+        groups.append((coord, coord, np.array([target.rad for target in self.targets], dtype=float)))
+        start = np.concatenate([group[0] for group in groups])
+        end = None if not self.continuous else np.concatenate([group[1] for group in groups])
+        rad = np.concatenate([group[2] for group in groups])
+        return start, end, rad, [len(group[2]) for group in groups]
+
+    def collide_gun(self):
+        '''
+        Enemy balls and bombs that reach the user's gun go off and count as hits.
+        The gun is a single circle, so it's tested directly instead of through the grid.
+        '''
+        if len(self.enemy_balls):
+            start, end = self.ball_path(self.enemy_balls)
+            rad = self.enemy_balls.live()[1] + self.gun.rad
+            if end is None:
+                hit = ((start - self.gun.coord)**2).sum(axis=1) <= rad**2
+            else:
+                hit, t = time_of_impact(start - self.gun.coord, end - start, rad)
+            if hit.any():
+                self.score_t.hits += int(hit.sum())
+                self.enemy_balls.alive[:len(hit)] &= ~hit
+                self.enemy_balls.remove_dead()
+        if self.bombs:
+            falling = [bomb for bomb in self.bombs if not bomb.check_collision(self.gun)]
+            if len(falling) < len(self.bombs):
+                self.score_t.hits += len(self.bombs) - len(falling)
+                for bomb in self.bombs:
+                    if bomb.check_collision(self.gun):
+                        bomb.release()
+                self.bombs = falling
 
+    def collide(self):
+        '''
+        Resolves all collisions of the tick: enemy balls and bombs hit the user's gun, then user's balls
+        destroy targets and user's and enemy balls destroy each other in one pass over a shared grid.
+        The grid is only built while the user has balls in flight, nothing else can collide without them.
+        '''
+        self.pairs_tested = 0
+        self.collide_gun()
+        if len(self.balls) == 0:
+            return
+        start, end, rad, sizes = self.bodies()
+        first = np.cumsum([0] + sizes)
+        group = np.repeat(np.arange(len(sizes)), sizes)
+        # the grid is rebuilt every tick, then only nearby pairs are tested exactly
+        i, j, t = self.grid.pairs(start, end, rad)
+        self.pairs_tested = self.grid.pairs_tested
+        # i < j and the groups are in index order, so every pair comes as (lower group, higher group)
+        kind = group[i] * len(sizes) + group[j]
+        i = i - first[group[i]]
+        j = j - first[group[j]]
+
+        def between(a, b):
+            mask = kind == a * len(sizes) + b
+            return i[mask], j[mask]
+
+        ball_target = between(BALL, TARGET)
+        ball_enemy = between(BALL, ENEMY_BALL)
+
+        if ball_enemy[0].size:
+            self.balls.alive[ball_enemy[0]] = False
+            self.enemy_balls.alive[ball_enemy[1]] = False
+            self.balls.remove_dead()
+            self.enemy_balls.remove_dead()
+        hit = set(ball_target[1].tolist())
+        if hit:
+            self.score_t.t_destr += len(hit)
+            # the list is compacted in one pass instead of popping every hit target
+            self.motion.remove([self.targets[k] for k in hit])
+            self.targets = [target for k, target in enumerate(self.targets) if k not in hit]
+
+
+def game_main_loop(record=None, profile=None, enemy_aiming=False):
+    screen = pg.display.set_mode(SCREEN_SIZE)
+    pg.display.set_caption("The gun of Khiryanov")
+
+    # the game is seeded, so together with the recorded input it can be replayed exactly
+    seed = random.randrange(2**32)
+    random.seed(seed)
+    mgr = Manager(n_targets=4, enemy_aiming=enemy_aiming)
+    recorder = None
+    if record is not None:
+        recorder = Recorder(record, seed, n_targets=4, enemy_aiming=enemy_aiming)
+    # only the parts of the screen that changed are redrawn and sent to the display
+    renderer = DirtyRenderer(screen, BLACK)
+    if profile is not None:
+        # F3 shows and hides the profiler overlay
+        mgr.profiler = FrameProfiler()
+    # input, 15 game ticks per second and up to 60 frames per second run as separate tasks
+    runner = LoopRunner(tick_rate=15, fps=60)
+    pending = []
+
+    def handle(events):
+        # events are handled at once, so the gun reacts without waiting for the tick;
+        # they are recorded with the next tick, before whose step a replay handles them
+        if mgr.profiler is not None:
+            mgr.profiler.begin()
+        done = mgr.handle_events(events)
+        pending.extend(events)
+        if mgr.profiler is not None:
+            # firing and building a firing table happen here, they add up in the next tick like drawing
+            mgr.profiler.lap('events')
+            if any(event.type == pg.KEYDOWN and event.key == pg.K_F3 for event in events):
+                mgr.profiler.visible = not mgr.profiler.visible
+                renderer.invalidate()
+        if done and recorder is not None:
+            recorder.record(pending)
+        return done
 
-pg.quit()
+    def tick():
+        aim = pg.mouse.get_pos() if pg.mouse.get_focused() else None
+        if recorder is not None:
+            recorder.record(pending, aim)
+        pending.clear()
+        mgr.advance([], aim)
+        if mgr.profiler is not None:
+            mgr.profiler.end_frame(mgr)
+        return False
+
+    def draw(alpha):
+        if mgr.profiler is not None:
+            mgr.profiler.begin()
+        # the gun is drawn turned to the mouse right away, the game only turns it on the next tick
+        aim = pg.mouse.get_pos() if pg.mouse.get_focused() else None
+        dirty = renderer.render(mgr, alpha, aim)
+        if mgr.profiler is not None:
+            # time of all the frames drawn between two ticks adds up in the next tick
+            mgr.profiler.lap('draw')
+            overlay = mgr.profiler.draw(screen)
+            if overlay is not None:
+                dirty.append(overlay)
+        pg.display.update(dirty)
+
+    runner.start(handle, tick, draw)
+
+    if recorder is not None:
+        recorder.close()
+    if profile:
+        mgr.profiler.export(profile)
+    pg.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="The gun of Khiryanov")
+    parser.add_argument("--record", help="file to record the session into, see replay.py")
+    parser.add_argument("--profile", nargs="?", const="",
+                        help="turns the frame profiler on (F3 shows it), saves frames into a .csv or .json file on exit")
+    parser.add_argument("--enemy-aiming", action="store_true",
+                        help="the enemy cannon shoots at the user's gun, its firing table takes a few seconds to build")
+    args = parser.parse_args()
+    game_main_loop(args.record, args.profile, args.enemy_aiming)
@@ -0,0 +1,103 @@
+import pygame as pg
+
+
+class DirtyRenderer:
+    '''
+    Dirty rectangle renderer. Remembers what was drawn in the previous frame and redraws
+    only the regions where something appeared, disappeared or moved.
+    '''
+    def __init__(self, screen, background=(0, 0, 0), full_redraw_share=0.3):
+        '''
+        Constructor method. Sets the surface to draw on, its background color and the share
+        of the screen area above which the whole screen is redrawn instead.
+        '''
+        self.screen = screen
+        self.background = background
+        self.full_redraw_share = full_redraw_share
+        # key -> (rect, what to draw) of everything drawn in the previous frame
+        self.drawn = {}
+        self.full_redraw = True
+
+    def invalidate(self):
+        '''
+        Makes the next frame redraw the whole screen, e.g. after the window was resized or covered.
+        '''
+        self.full_redraw = True
+
+    def collect(self, mgr, alpha=1, aim=None):
+        '''
+        Returns a dict key -> (rect, what to draw) of the current frame in drawing order.
+        A key stays the same as long as the thing looks the same and stands still.
+        The user's gun is turned to aim, if it's given.
+        '''
+        items = {}
+        for surf, pos in mgr.sprites(alpha) + mgr.score_t.sprites():
+            # cached surfaces are shared, so the surface itself identifies the shape
+            items[(id(surf), pos)] = (surf.get_rect(topleft=pos), (surf, pos))
+        angle = None if aim is None else mgr.gun.angle_to(aim)
+        for gun, gun_angle in ((mgr.gun, angle), (mgr.enemy_cannon, None)):
+            points = tuple(tuple(point) for point in gun.get_shape_points(gun_angle))
+            xs = [point[0] for point in points]
+            ys = [point[1] for point in points]
+            rect = pg.Rect(min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
+            items[('gun', gun.color, points)] = (rect, (gun.color, points))
+        return items
+
+    def draw_item(self, what):
+        '''
+        Draws a (surface, position) pair or a (color, points) polygon.
+        '''
+        if isinstance(what[0], pg.Surface):
+            self.screen.blit(*what)
+        else:
+            pg.draw.polygon(self.screen, *what)
+
+    @staticmethod
+    def merge(rects):
+        '''
+        Joins overlapping rects, e.g. the old and the new place of a moving shape, into their union.
+        '''
+        merged = []
+        for rect in rects:
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect = rect.union(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def render(self, mgr, alpha=1, aim=None):
+        '''
+        Draws the frame of the game manager, alpha of the way from the previous tick to the last one,
+        with the user's gun turned to aim, if it's given. Returns the list of rects to pass to pg.display.update.
+        '''
+        items = self.collect(mgr, alpha, aim)
+        dirty = [rect for key, (rect, what) in self.drawn.items() if key not in items]
+        dirty += [rect for key, (rect, what) in items.items() if key not in self.drawn]
+        # when most of the screen changes, one full redraw is cheaper than many small ones
+        area = self.screen.get_width() * self.screen.get_height()
+        if sum(rect.w * rect.h for rect in dirty) > self.full_redraw_share * area:
+            self.full_redraw = True
+        if self.full_redraw:
+            self.screen.fill(self.background)
+            for rect, what in items.values():
+                self.draw_item(what)
+            self.drawn = items
+            self.full_redraw = False
+            return [self.screen.get_rect()]
+
+        self.drawn = items
+        if not dirty:
+            return []
+        dirty = self.merge(dirty)
+        rects = [rect for rect, what in items.values()]
+        whats = [what for rect, what in items.values()]
+        for area in dirty:
+            # everything touching the dirty area is redrawn, clipped to it, so the
+            # drawing order stays right where shapes overlap
+            self.screen.set_clip(area)
+            self.screen.fill(self.background, area)
+            for i in area.collidelistall(rects):
+                self.draw_item(whats[i])
+        self.screen.set_clip(None)
+        return dirty
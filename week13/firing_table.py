@@ -0,0 +1,112 @@
+import numpy as np
+
+from projectiles import ShellPool
+
+
+class FiringTable:
+    '''
+    Cached firing solutions. For a cannon standing in a given cell of the screen the table maps
+    a target offset (dx, dy) to the (angle, power) of the fastest shot that reaches it,
+    wall bounces included. A decision is then a table lookup instead of a search.
+    '''
+    def __init__(self, bounds, min_pow=10, max_pow=50, grav=2, rad=20,
+                 cell_size=20, origin_cell=40, n_angles=120, pow_step=2, max_ticks=60):
+        '''
+        Constructor method. Sets screen bounds, shot parameters and resolution of the table.
+        '''
+        self.bounds = np.array(bounds, dtype=float)
+        self.grav = grav
+        self.rad = rad
+        self.cell_size = cell_size
+        self.origin_cell = origin_cell
+        self.max_ticks = max_ticks
+        angles = np.linspace(-np.pi, np.pi, n_angles, endpoint=False)
+        powers = np.arange(min_pow, max_pow + 1, pow_step)
+        self.angles, self.powers = [a.ravel() for a in np.meshgrid(angles, powers)]
+        # (dx, dy) offsets cover the whole screen in every direction
+        self.offset = np.ceil(self.bounds / cell_size).astype(int)
+        self.shape = tuple(2*self.offset + 1)
+        self.tables = {}
+
+    def origin_key(self, origin):
+        '''
+        Returns the origin cell of a cannon position. Shots from one cell bounce off the walls alike.
+        '''
+        return tuple((np.asarray(origin, dtype=float) // self.origin_cell).astype(int))
+
+    def build(self, key):
+        '''
+        Builds the table for one origin cell: fires every candidate shot from the center of the cell
+        at once and records, for every (dx, dy) cell, the first candidate that gets there.
+        '''
+        origin = (np.array(key) + 0.5) * self.origin_cell
+        origin = np.minimum(np.maximum(origin, self.rad), self.bounds - self.rad)
+        pool = ShellPool(self.bounds, capacity=len(self.angles))
+        pool.n = len(self.angles)
+        pool.coord[:] = origin
+        pool.vel[:, 0] = np.trunc(self.powers * np.cos(self.angles))
+        pool.vel[:, 1] = np.trunc(self.powers * np.sin(self.angles))
+        pool.rad[:] = self.rad
+        pool.alive[:] = True
+
+        best = np.full(self.shape, -1)
+        ticks = np.zeros(self.shape, dtype=int)
+        for tick in range(1, self.max_ticks + 1):
+            pool.move(grav=self.grav)
+            alive = np.flatnonzero(pool.alive)
+            if len(alive) == 0:
+                break
+            cells = np.floor((pool.coord[alive] - origin) / self.cell_size).astype(int) + self.offset
+            flat = np.ravel_multi_index((cells[:, 0], cells[:, 1]), self.shape)
+            # ticks go in increasing order, so the first shot to reach a cell is the fastest one
+            new = best.flat[flat] < 0
+            best.flat[flat[new]] = alive[new]
+            ticks.flat[flat[new]] = tick
+
+        table = {'angle': np.where(best >= 0, self.angles[best], np.nan),
+                 'pow': np.where(best >= 0, self.powers[best], np.nan),
+                 'ticks': np.where(best >= 0, ticks, -1)}
+        self.tables[key] = table
+        return table
+
+    def precompute(self):
+        '''
+        Builds tables for every origin cell of the screen at once, e.g. before a batch run.
+        '''
+        nx, ny = np.ceil(self.bounds / self.origin_cell).astype(int)
+        for i in range(nx):
+            for j in range(ny):
+                if (i, j) not in self.tables:
+                    self.build((i, j))
+
+    def lookup(self, origin, target):
+        '''
+        Returns (angle, power) of a shot from origin to target, interpolated bilinearly between
+        the solutions of the four nearest (dx, dy) cells. Returns None if target can't be reached.
+        '''
+        key = self.origin_key(origin)
+        table = self.tables.get(key)
+        if table is None:
+            table = self.build(key)
+        d = (np.asarray(target, dtype=float) - origin) / self.cell_size + self.offset - 0.5
+        base = np.floor(d).astype(int)
+        frac = d - base
+        num = np.zeros(2)
+        pow = 0.0
+        weight = 0.0
+        for i in range(2):
+            for j in range(2):
+                x, y = base[0] + i, base[1] + j
+                if not (0 <= x < self.shape[0] and 0 <= y < self.shape[1]):
+                    continue
+                angle = table['angle'][x, y]
+                if np.isnan(angle):
+                    continue
+                w = (frac[0] if i else 1 - frac[0]) * (frac[1] if j else 1 - frac[1])
+                # angles are averaged as unit vectors, so -pi and pi don't cancel out
+                num += w * np.array([np.cos(angle), np.sin(angle)])
+                pow += w * table['pow'][x, y]
+                weight += w
+        if weight == 0:
+            return None
+        return np.arctan2(num[1], num[0]), pow / weight
@@ -0,0 +1,65 @@
+import numpy as np
+
+# All integrators advance float arrays of coordinates and velocities in place by the time step dt.
+# accel(coord, vel) returns the acceleration, an array that broadcasts against coord.
+
+
+def euler(coord, vel, accel, dt):
+    '''
+    Semi-implicit Euler: velocity first, then position with the new velocity.
+    The cheapest one, a single acceleration per step, first order accurate.
+    '''
+    vel += dt * accel(coord, vel)
+    coord += dt * vel
+
+
+def verlet(coord, vel, accel, dt):
+    '''
+    Velocity Verlet, second order accurate and exact for a constant acceleration like gravity.
+    '''
+    acc = accel(coord, vel)
+    coord += dt * vel + dt**2 / 2 * acc
+    vel += dt / 2 * (acc + accel(coord, vel + dt * acc))
+
+
+def rk4(coord, vel, accel, dt):
+    '''
+    Classic fourth order Runge-Kutta, four accelerations per step.
+    Worth it when the acceleration depends on position or velocity.
+    '''
+    a1 = accel(coord, vel)
+    v2 = vel + dt / 2 * a1
+    a2 = accel(coord + dt / 2 * vel, v2)
+    v3 = vel + dt / 2 * a2
+    a3 = accel(coord + dt / 2 * v2, v3)
+    v4 = vel + dt * a3
+    a4 = accel(coord + dt * v3, v4)
+    coord += dt / 6 * (vel + 2*v2 + 2*v3 + v4)
+    vel += dt / 6 * (a1 + 2*a2 + 2*a3 + a4)
+
+
+INTEGRATORS = {'euler': euler, 'verlet': verlet, 'rk4': rk4}
+
+
+def get(integrator):
+    '''
+    Returns the integrator function by its name, functions are returned as they are.
+    '''
+    if callable(integrator):
+        return integrator
+    try:
+        return INTEGRATORS[integrator]
+    except KeyError:
+        raise ValueError("unknown integrator {!r}, expected one of {}".format(
+            integrator, ', '.join(INTEGRATORS))) from None
+
+
+def substeps(vel, dt, max_travel, max_substeps=16):
+    '''
+    Returns the number of substeps that keeps the fastest object from moving further
+    than max_travel in one substep, but not more than max_substeps.
+    '''
+    if len(vel) == 0 or max_travel <= 0:
+        return 1
+    speed = np.sqrt((vel**2).sum(axis=1).max())
+    return int(min(max(np.ceil(speed * dt / max_travel), 1), max_substeps))
@@ -0,0 +1,130 @@
+import argparse
+import os
+import random
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import Simulation
+from cannon import SCREEN_SIZE
+
+
+class Bot:
+    '''
+    Scripted player of one session. Every tick it may move the gun, then it goes through
+    charge and strike cycles, aiming at a target or at a random point.
+    '''
+    def __init__(self, mgr, rng, move_chance=0.3, aimed_share=0.5):
+        '''
+        Constructor method. Sets the game manager to play, a random.Random of the bot,
+        the chance to move in a tick and the share of shots aimed at targets.
+        '''
+        self.mgr = mgr
+        self.rng = rng
+        self.move_chance = move_chance
+        self.aimed_share = aimed_share
+        # ticks left until the charged gun strikes
+        self.charge = 0
+
+    def act(self):
+        gun = self.mgr.gun
+        rng = self.rng
+        if rng.random() < self.move_chance:
+            if rng.random() < 0.5:
+                gun.horizontalMove(rng.choice((-5, 5)))
+            else:
+                gun.verticalMove(rng.choice((-5, 5)))
+        if self.charge == 0:
+            targets = self.mgr.targets
+            if targets and rng.random() < self.aimed_share:
+                gun.set_angle(rng.choice(targets).coord)
+            else:
+                gun.set_angle((rng.randrange(SCREEN_SIZE[0]), rng.randrange(SCREEN_SIZE[1])))
+            gun.activate()
+            self.charge = rng.randint(1, 20)
+        else:
+            self.charge -= 1
+            if self.charge == 0:
+                self.mgr.fire()
+
+
+def run_sessions(n, ticks, seed=0, n_targets=4):
+    '''
+    Hosts n sessions in this process, ticking them round robin like a server core would.
+    Returns their tick latencies in seconds, the wall and CPU time spent and the memory of a session in bytes.
+    '''
+    def session(i):
+        sim = Simulation(n_targets=n_targets, seed=seed + i)
+        bot = Bot(sim.mgr, random.Random(seed + i))
+        # a few ticks first, so the memory includes shells in flight
+        for k in range(20):
+            bot.act()
+            sim.tick_once()
+        return sim, bot
+
+    # the first session fills the caches shared by all of them, it isn't counted
+    session(-1)
+    tracemalloc.start()
+    sessions = [session(i) for i in range(n)]
+    memory = tracemalloc.get_traced_memory()[0] / n
+    tracemalloc.stop()
+
+    latency = np.zeros(n * ticks)
+    k = 0
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for t in range(ticks):
+        for sim, bot in sessions:
+            tick_start = time.perf_counter()
+            bot.act()
+            sim.tick_once()
+            latency[k] = time.perf_counter() - tick_start
+            k += 1
+    return latency, time.perf_counter() - start, time.process_time() - cpu_start, memory
+
+
+def load_test(sessions, ticks, workers, seed=0):
+    '''
+    Spreads the sessions over a pool of worker processes. Returns a dict of the results:
+    ticks per second of all the workers and per CPU second, latency percentiles in ms
+    and the memory of a session in KB.
+    '''
+    workers = max(1, min(workers, sessions))
+    shares = [sessions // workers + (i < sessions % workers) for i in range(workers)]
+    seeds = np.cumsum([seed] + shares[:-1])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_sessions, shares, [ticks] * workers, seeds.tolist()))
+    latency = np.concatenate([result[0] for result in results])
+    wall = max(result[1] for result in results)
+    # CPU time, so workers sharing a core don't make it look faster or slower
+    cpu = sum(result[2] for result in results)
+    return {'sessions': sessions, 'workers': workers,
+            'ticks_per_s': sessions * ticks / wall, 'ticks_per_s_core': sessions * ticks / cpu,
+            'p50_ms': float(1000 * np.percentile(latency, 50)), 'p99_ms': float(1000 * np.percentile(latency, 99)),
+            'memory_kb': float(np.mean([result[3] for result in results]) / 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of headless cannon game sessions played by bots.')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--ticks', type=int, default=300, help='ticks every session plays')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--tick-rate', type=int, default=15, help='tick rate a hosted session needs')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{:>8} {:>7} {:>11} {:>13} {:>8} {:>8} {:>9} {:>14}'.format(
+        'sessions', 'workers', 'ticks/s', 'ticks/s/core', 'p50 ms', 'p99 ms', 'KB/sess', 'sessions/core'))
+    for n in args.sessions:
+        r = load_test(n, args.ticks, args.workers, args.seed)
+        # how many sessions a core could keep at the tick rate
+        capacity = r['ticks_per_s_core'] / args.tick_rate
+        print('{:8d} {:7d} {:11.0f} {:13.0f} {:8.3f} {:8.3f} {:9.1f} {:14.0f}'.format(
+            n, r['workers'], r['ticks_per_s'], r['ticks_per_s_core'], r['p50_ms'], r['p99_ms'],
+            r['memory_kb'], capacity))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pygame
+
+
+class LoopRunner:
+    '''
+    Game loop on asyncio. Input polling, fixed rate simulation ticks and rendering are three
+    separate tasks, so events are read as soon as they come, the game runs at the same speed
+    whatever the frame rate is, and frames are drawn between the ticks, interpolated.
+    '''
+    def __init__(self, tick_rate, fps=60, poll_rate=250, max_catch_up=5):
+        '''
+        Constructor method. Sets simulation ticks per second, the frame rate cap, how often
+        events are polled and how many late ticks are run at once before the rest are skipped.
+        '''
+        self.dt = 1 / tick_rate
+        self.frame_time = 1 / fps
+        self.poll_time = 1 / poll_rate
+        self.max_catch_up = max_catch_up
+        self.last_tick = time.perf_counter()
+        self.ticks = 0
+        self.frames = 0
+        self.done = None
+
+    def stop(self):
+        '''
+        Ends the loop after the current task step.
+        '''
+        if self.done is not None:
+            self.done.set()
+
+    def alpha(self):
+        '''
+        Returns the share of a tick passed since the last simulation tick, from 0 to 1.
+        Renderers draw prev + alpha * (current - prev).
+        '''
+        return min(max((time.perf_counter() - self.last_tick) / self.dt, 0), 1)
+
+    async def poll_input(self, handle):
+        '''
+        Passes new events to handle(events) until it returns True.
+        '''
+        while not self.done.is_set():
+            if handle(pygame.event.get()):
+                self.stop()
+            await asyncio.sleep(self.poll_time)
+
+    async def simulate(self, tick):
+        '''
+        Calls tick() every dt seconds until it returns True. A late loop catches up
+        with at most max_catch_up ticks, the rest of the delay is dropped.
+        '''
+        next_tick = time.perf_counter() + self.dt
+        while not self.done.is_set():
+            now = time.perf_counter()
+            late = 0
+            while now >= next_tick and late < self.max_catch_up:
+                if tick():
+                    self.stop()
+                    return
+                self.ticks += 1
+                self.last_tick = next_tick
+                next_tick += self.dt
+                late += 1
+            if now >= next_tick:
+                # too far behind, the game slows down instead of freezing
+                next_tick = now + self.dt
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+
+    async def render(self, draw):
+        '''
+        Calls draw(alpha) at most fps times per second.
+        '''
+        while not self.done.is_set():
+            start = time.perf_counter()
+            draw(self.alpha())
+            self.frames += 1
+            await asyncio.sleep(max(self.frame_time - (time.perf_counter() - start), 0))
+
+    async def run(self, handle, tick, draw):
+        '''
+        Runs the three tasks until one of them ends the game.
+        '''
+        self.done = asyncio.Event()
+        self.last_tick = time.perf_counter()
+        tasks = [asyncio.create_task(self.poll_input(handle)),
+                 asyncio.create_task(self.simulate(tick)),
+                 asyncio.create_task(self.render(draw))]
+        for task in tasks:
+            # a task that fails ends the game too
+            task.add_done_callback(lambda task: self.stop())
+        try:
+            await self.done.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # an exception of a task shouldn't be lost
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    def start(self, handle, tick, draw):
+        '''
+        Runs the loop from ordinary code, blocks until the game ends.
+        '''
+        asyncio.run(self.run(handle, tick, draw))
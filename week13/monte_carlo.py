@@ -0,0 +1,88 @@
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import Simulation
+
+# columns of the batch result and their types
+COLUMNS = [('seed', np.int64), ('angle', np.float64), ('pow', np.int32),
+           ('target_rad', np.int32), ('t_destr', np.int32), ('b_used', np.int32),
+           ('score', np.int32), ('ticks', np.int64)]
+
+
+def run_episode(seed, angle, pow, target_rad, shots=5, n_targets=4, max_ticks=300):
+    '''
+    Plays one seeded headless game: fires shots balls with the given angle and power
+    and lets each of them fly until it dies. Returns the episode's row of the result.
+    '''
+    sim = Simulation(n_targets=n_targets, seed=seed, target_rad=target_rad)
+    gun = sim.mgr.gun
+    for i in range(shots):
+        gun.angle = angle
+        sim.fire(min(pow, gun.max_pow))
+        sim.run(max_ticks, until_idle=True)
+    score_t = sim.mgr.score_t
+    return (seed, angle, pow, target_rad, score_t.t_destr, score_t.b_used, score_t.score(), sim.tick)
+
+
+def run_chunk(episodes):
+    '''
+    Runs a list of episodes in one worker process, so the pool isn't flooded with tiny tasks.
+    '''
+    return [run_episode(*episode) for episode in episodes]
+
+
+def run_batch(angles, powers, target_rads, episodes=100, seed=0, workers=None, chunk_size=64):
+    '''
+    Runs episodes seeded games for every combination of angle, power and target radius
+    across a process pool. Returns a dict of numpy arrays, one column per field of COLUMNS.
+    '''
+    # every episode gets its own seed derived from the batch seed, so the batch is reproducible
+    seeds = np.random.SeedSequence(seed).generate_state(episodes)
+    params = [(int(s), float(a), int(p), int(r))
+              for a, p, r in itertools.product(angles, powers, target_rads) for s in seeds]
+    chunks = [params[i:i + chunk_size] for i in range(0, len(params), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = [row for chunk in pool.map(run_chunk, chunks) for row in chunk]
+    result = {}
+    for k, (name, dtype) in enumerate(COLUMNS):
+        result[name] = np.array([row[k] for row in rows], dtype=dtype)
+    return result
+
+
+def hit_rates(result):
+    '''
+    Returns mean destroyed targets per ball for every (angle, pow, target_rad) combination.
+    '''
+    keys = np.stack([result['angle'], result['pow'], result['target_rad']], axis=1)
+    combos, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    destr = np.bincount(inverse, weights=result['t_destr'])
+    used = np.bincount(inverse, weights=result['b_used'])
+    return combos, destr / np.maximum(used, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo hit rates of the cannon game.')
+    parser.add_argument('--angles', type=float, nargs='+', default=[-0.8, -0.6, -0.4, -0.2])
+    parser.add_argument('--powers', type=int, nargs='+', default=[20, 30, 40, 50])
+    parser.add_argument('--radii', type=int, nargs='+', default=[10, 20, 30])
+    parser.add_argument('--episodes', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help='saves the columns into a .npz file')
+    args = parser.parse_args()
+
+    result = run_batch(args.angles, args.powers, args.radii, args.episodes, args.seed, args.workers)
+    if args.output:
+        np.savez_compressed(args.output, **result)
+    combos, rates = hit_rates(result)
+    print('angle    pow  rad  hit rate')
+    for (angle, pow, rad), rate in zip(combos, rates):
+        print('{:6.2f} {:5d} {:4d}  {:.3f}'.format(angle, int(pow), int(rad), rate))
+
+
+if __name__ == "__main__":
+    main()
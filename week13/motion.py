@@ -0,0 +1,164 @@
+import numpy as np
+
+
+def linear(coord, vel, acc):
+    '''
+    Regular movement with constant velocity.
+    '''
+    coord += vel
+
+
+def accelerate(coord, vel, acc):
+    '''
+    Accelerated movement, makes targets more difficult to hit.
+    '''
+    vel += acc
+    coord += vel
+
+
+# movement types by the number drawn for a target every frame
+KERNELS = (linear, accelerate)
+
+
+def bounce(coord, vel, rad, bounds):
+    '''
+    Keeps circles inside the arena, reflecting velocities of those that touch its walls.
+    '''
+    for i in range(2):
+        low = rad
+        high = bounds[i] - rad
+        hit = (coord[:, i] < low) | (coord[:, i] > high)
+        if not hit.any():
+            continue
+        coord[:, i] = np.minimum(np.maximum(coord[:, i], low), high)
+        vel[:, i] = np.where(hit, -vel[:, i], vel[:, i])
+
+
+
+
+class TargetMotion:
+    '''
+    Motion state of the moving targets in numpy arrays. Every frame each target draws its movement
+    type, then every type is applied to all of its targets with array operations.
+    The arrays are the real state, the targets' coordinates are only written back for drawing
+    and collisions. A handful of targets is cheaper to move one by one: then the targets
+    themselves hold the state and the arrays aren't used.
+    '''
+    def __init__(self, bounds, rng, min_batch=16):
+        '''
+        Constructor method. Sets the arena size, the numpy generator drawing movement types
+        and the number of targets from which they are moved with array operations.
+        '''
+        self.bounds = np.array(bounds, dtype=float)
+        self.size = tuple(self.bounds.tolist())
+        self.rng = rng
+        self.min_batch = min_batch
+        # movement types drawn ahead, see draw()
+        self.kinds = np.zeros(0, dtype=np.int64)
+        self.drawn = 0
+        self.clear()
+
+    def __len__(self):
+        return len(self.targets)
+
+    def clear(self):
+        '''
+        Forgets all targets.
+        '''
+        self.targets = []
+        # whether the arrays hold the state of the targets
+        self.batched = False
+        self.load()
+
+    def load(self):
+        '''
+        Fills the arrays from the targets.
+        '''
+        self.coord = np.array([target.coord for target in self.targets], dtype=float).reshape(-1, 2)
+        self.vel = np.array([(target.vx, target.vy) for target in self.targets], dtype=float).reshape(-1, 2)
+        self.acc = np.array([(target.ax, target.ay) for target in self.targets], dtype=float).reshape(-1, 2)
+        self.rad = np.array([target.rad for target in self.targets], dtype=float)
+
+    def store(self):
+        '''
+        Gives the velocities in the arrays back to the targets, their coordinates are always up to date.
+        '''
+        for target, (vx, vy) in zip(self.targets, self.vel.tolist()):
+            target.vx = vx
+            target.vy = vy
+
+    def draw(self, n, block=4096):
+        '''
+        Returns the movement types of n targets. The generator is called for a block of them at once,
+        a call every frame would cost more than moving a few targets.
+        '''
+        if self.drawn + n > len(self.kinds):
+            self.kinds = self.rng.integers(0, len(KERNELS), max(block, n))
+            self.drawn = 0
+        kinds = self.kinds[self.drawn:self.drawn + n]
+        self.drawn += n
+        return kinds
+
+    def add(self, targets):
+        '''
+        Takes over the motion of the given targets.
+        '''
+        if not targets:
+            return
+        self.targets += targets
+        if self.batched:
+            self.coord = np.concatenate([self.coord, [target.coord for target in targets]])
+            self.vel = np.concatenate([self.vel, [(target.vx, target.vy) for target in targets]])
+            self.acc = np.concatenate([self.acc, [(target.ax, target.ay) for target in targets]])
+            self.rad = np.concatenate([self.rad, [target.rad for target in targets]])
+
+    def remove(self, targets):
+        '''
+        Stops moving the given targets, e.g. after they were destroyed.
+        '''
+        gone = {id(target) for target in targets}
+        keep = [id(target) not in gone for target in self.targets]
+        if all(keep):
+            return
+        self.targets = [target for target, k in zip(self.targets, keep) if k]
+        if self.batched:
+            keep = np.array(keep, dtype=bool)
+            self.coord = self.coord[keep]
+            self.vel = self.vel[keep]
+            self.acc = self.acc[keep]
+            self.rad = self.rad[keep]
+
+    def move(self):
+        '''
+        Moves all targets one frame, bounces them off the walls and writes their coordinates back.
+        Coordinates are updated in place, so the targets keep their lists, and the old ones go to prev.
+        '''
+        if not self.targets:
+            return
+        kinds = self.draw(len(self.targets))
+        batched = len(self.targets) >= self.min_batch
+        if batched != self.batched:
+            # the state only changes hands when the number of targets crosses min_batch
+            if batched:
+                self.load()
+            else:
+                self.store()
+            self.batched = batched
+        if not batched:
+            # MovingTargets.move does the same float arithmetic, so both ways move the targets alike
+            for target, kind in zip(self.targets, kinds.tolist()):
+                target.prev[:] = target.coord
+                target.move(kind, self.size)
+            return
+        for kind, kernel in enumerate(KERNELS):
+            sel = np.flatnonzero(kinds == kind)
+            if len(sel) == 0:
+                continue
+            coord, vel = self.coord[sel], self.vel[sel]
+            kernel(coord, vel, self.acc[sel])
+            self.coord[sel] = coord
+            self.vel[sel] = vel
+        bounce(self.coord, self.vel, self.rad, self.bounds)
+        for target, coord in zip(self.targets, self.coord.tolist()):
+            target.prev[:] = target.coord
+            target.coord[:] = coord
@@ -0,0 +1,520 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+# the server and the bots never open a window, play() switches to a real display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame as pg
+
+from cannon import Manager, Cannon, EnemyCannon, SCREEN_SIZE, BLACK, RED, BLUE
+from render_cache import shape_cache
+
+TICK_RATE = 15
+# every message is a length prefixed JSON object
+FRAME = struct.Struct('<I')
+# players of one match: the user's gun and the enemy cannon
+PLAYERS = 2
+# a client that doesn't read its snapshots is dropped when this much is waiting for it
+MAX_BACKLOG = 1 << 20
+# inputs are tiny, a longer message from a client is an error
+MAX_INPUT = 1024
+INPUT_KEYS = {'q', 'm', 'a', 'c', 'f'}
+# a gun moves by one key press per input, like in Manager.handle_events
+MOVES = (-5, 0, 5)
+
+
+def send(writer, message):
+    '''
+    Writes one message, returns its size in bytes.
+    '''
+    data = json.dumps(message, separators=(',', ':')).encode()
+    writer.write(FRAME.pack(len(data)) + data)
+    return FRAME.size + len(data)
+
+
+async def receive(reader, max_size=None):
+    '''
+    Reads one message. Raises ValueError if it's longer than max_size bytes or isn't JSON.
+    '''
+    size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if max_size is not None and size > max_size:
+        raise ValueError('message of {} bytes'.format(size))
+    return json.loads(await reader.readexactly(size))
+
+
+def apply_input(gun, inp):
+    '''
+    Moves, turns and charges a gun by one input message. Runs on the server and, for prediction,
+    on the client, so both get the same result.
+    '''
+    dx, dy = inp['m']
+    if dx:
+        gun.horizontalMove(dx)
+    if dy:
+        gun.verticalMove(dy)
+    if inp['a'] is not None:
+        gun.set_angle(inp['a'])
+    if inp['c']:
+        gun.activate()
+
+
+def predict_input(gun, inp):
+    '''
+    Applies an input to the client's predicted gun. A fired shot is only made by the server,
+    the prediction just discharges the gun the way Cannon.strike does.
+    '''
+    apply_input(gun, inp)
+    if inp['f']:
+        gun.pow = gun.min_pow
+        gun.active = False
+
+
+def valid_input(inp):
+    '''
+    Tells whether a message from a client is a well formed input, see Client.send_input.
+    The server checks every input before it reaches the game, so a client can neither break
+    the match nor move its gun further than the keys do.
+    '''
+    def number(x):
+        return type(x) in (int, float) and math.isfinite(x)
+
+    return (isinstance(inp, dict) and inp.keys() == INPUT_KEYS
+            and type(inp['q']) is int
+            and isinstance(inp['m'], list) and len(inp['m']) == 2
+            and all(type(x) is int and x in MOVES for x in inp['m'])
+            and (inp['a'] is None or isinstance(inp['a'], list) and len(inp['a']) == 2
+                 and all(number(x) for x in inp['a']))
+            and type(inp['c']) is bool and type(inp['f']) is bool)
+
+
+def gun_state(gun):
+    return [int(gun.coord[0]), int(gun.coord[1]), round(float(gun.angle), 3), int(gun.pow)]
+
+
+def set_gun_state(gun, state):
+    gun.coord = [state[0], state[1]]
+    gun.angle, gun.pow = state[2], state[3]
+
+
+def diff(old, new):
+    '''
+    Delta compression: returns the entries of new which differ from old and the keys removed since old.
+    '''
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+class Match:
+    '''
+    One game on the server: an authoritative headless Manager, the user's gun and the enemy cannon
+    played by two clients.
+    '''
+    def __init__(self):
+        # the enemy cannon shoots with its own angle and power, which the second player sets
+        self.mgr = Manager(n_targets=4, enemy_aiming=True)
+        self.players = [None] * PLAYERS
+        self.next_id = 0
+
+    def guns(self):
+        return self.mgr.gun, self.mgr.enemy_cannon
+
+    def fire(self, slot):
+        if slot == 0:
+            ball = self.mgr.gun.strike()
+            self.mgr.balls.append(ball)
+            self.mgr.score_t.b_used += 1
+        else:
+            ball = self.mgr.enemy_cannon.strike()
+            self.mgr.enemy_balls.append(ball)
+        # the pool copied the shell, so it's free for the next strike
+        ball.release()
+
+    def tick(self):
+        '''
+        Applies the inputs the players sent since the last tick and steps the game.
+        '''
+        for slot, player in enumerate(self.players):
+            if player is None:
+                continue
+            gun = self.guns()[slot]
+            while player.inputs:
+                inp = player.inputs.popleft()
+                apply_input(gun, inp)
+                if inp['f']:
+                    self.fire(slot)
+                player.ack = inp['q']
+        # Manager.move only charges the user's gun
+        self.mgr.enemy_cannon.gain()
+        self.mgr.step()
+
+    def snapshot(self):
+        '''
+        Returns the state clients need to draw the game as a flat dict, one entry per object.
+        '''
+        mgr = self.mgr
+        state = {'g{}'.format(slot): gun_state(gun) for slot, gun in enumerate(self.guns())}
+        state['s'] = [mgr.score_t.t_destr, mgr.score_t.b_used, mgr.score_t.hits, mgr.score_t.score()]
+        for prefix, pool in (('b', mgr.balls), ('e', mgr.enemy_balls)):
+            coord, rad = pool.live()
+            for i, (x, y) in enumerate(coord.astype(int).tolist()):
+                state[prefix + str(i)] = [x, y, int(rad[i]), pool.sides[i], list(pool.color[i])]
+        for i, bomb in enumerate(mgr.bombs):
+            state['o' + str(i)] = [int(bomb.coord[0]), int(bomb.coord[1]), bomb.rad, 0, list(bomb.color)]
+        for target in mgr.targets:
+            # targets keep their ids, so the ones standing still cost nothing after the first snapshot
+            if not hasattr(target, 'net_id'):
+                target.net_id = self.next_id
+                self.next_id += 1
+            state['t{}'.format(target.net_id)] = [int(target.coord[0]), int(target.coord[1]), target.rad,
+                                                  target.sides, list(target.color)]
+        return state
+
+
+class Player:
+    '''
+    Server side of a client connection.
+    '''
+    def __init__(self, writer):
+        self.writer = writer
+        self.inputs = deque()
+        # sequence number of the last input applied to the game
+        self.ack = 0
+        # what the client has got so far, deltas are made against it
+        self.sent = {}
+        self.bytes_sent = 0
+
+
+class Server:
+    '''
+    Authoritative game server. Pairs clients into matches, runs all matches at a fixed tick rate
+    and sends every client a delta compressed snapshot after every tick.
+    '''
+    def __init__(self, host='127.0.0.1', port=0, tick_rate=TICK_RATE):
+        '''
+        Constructor method. Port 0 takes any free port, see self.port after start().
+        '''
+        self.host = host
+        self.port = port
+        self.dt = 1 / tick_rate
+        self.matches = []
+        # wall time of the last ticks of all matches, in seconds
+        self.tick_times = deque(maxlen=10000)
+        self.ticks = 0
+        self.started = None
+        self.server = None
+        self.loop_task = None
+        # tasks reading the clients' inputs
+        self.readers = set()
+
+    async def start(self):
+        # the first match would otherwise build the firing table of the enemy cannon
+        # inside the tick loop, stalling every match for seconds
+        EnemyCannon().solutions().precompute()
+        self.server = await asyncio.start_server(self.accept, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started = time.perf_counter()
+        self.loop_task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self.loop_task.cancel()
+        self.server.close()
+        for match in self.matches:
+            for player in match.players:
+                if player is not None:
+                    player.writer.close()
+        await asyncio.gather(*self.readers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def join(self, player):
+        '''
+        Puts the player into the first free slot of a match, returns (match, slot).
+        '''
+        for match in self.matches:
+            for slot in range(PLAYERS):
+                if match.players[slot] is None:
+                    match.players[slot] = player
+                    return match, slot
+        match = Match()
+        match.players[0] = player
+        self.matches.append(match)
+        return match, 0
+
+    def leave(self, match, slot):
+        match.players[slot] = None
+        if all(player is None for player in match.players):
+            self.matches.remove(match)
+
+    async def accept(self, reader, writer):
+        self.readers.add(asyncio.current_task())
+        player = Player(writer)
+        match, slot = self.join(player)
+        player.bytes_sent += send(writer, {'slot': slot, 'tick_rate': round(1 / self.dt)})
+        last = 0
+        try:
+            while True:
+                inp = await receive(reader, MAX_INPUT)
+                # a client sending anything else than inputs in sequence is dropped, the match goes on
+                if not valid_input(inp) or inp['q'] <= last:
+                    break
+                last = inp['q']
+                player.inputs.append(inp)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.leave(match, slot)
+            writer.close()
+            self.readers.discard(asyncio.current_task())
+
+    def tick(self):
+        '''
+        Steps every match once and sends the snapshots.
+        '''
+        for match in list(self.matches):
+            start = time.perf_counter()
+            match.tick()
+            state = match.snapshot()
+            self.tick_times.append(time.perf_counter() - start)
+            for slot, player in enumerate(match.players):
+                if player is None:
+                    continue
+                if player.writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                    player.writer.close()
+                    continue
+                changed, removed = diff(player.sent, state)
+                message = {'t': self.ticks, 'a': player.ack, 's': changed}
+                if removed:
+                    message['d'] = removed
+                player.bytes_sent += send(player.writer, message)
+                player.sent = state
+        self.ticks += 1
+
+    async def run(self):
+        next_tick = time.perf_counter()
+        while True:
+            self.tick()
+            next_tick += self.dt
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+
+    def stats(self):
+        '''
+        Returns tick cost percentiles in milliseconds and the bandwidth per player in bytes per second.
+        '''
+        players = [player for match in self.matches for player in match.players if player is not None]
+        elapsed = time.perf_counter() - self.started
+        times = np.array(self.tick_times) * 1000
+        return {'matches': len(self.matches), 'players': len(players), 'ticks': self.ticks,
+                'tick_p50_ms': float(np.percentile(times, 50)) if len(times) else 0.0,
+                'tick_p99_ms': float(np.percentile(times, 99)) if len(times) else 0.0,
+                'bytes_per_player_s': sum(player.bytes_sent for player in players) / max(len(players), 1) / elapsed}
+
+
+class Client:
+    '''
+    Game client. Sends inputs, keeps the state made from the server's snapshots and predicts
+    its own gun: inputs the server hasn't applied yet are applied again on top of every snapshot.
+    '''
+    def __init__(self):
+        self.state = {}
+        self.slot = None
+        self.tick = 0
+        self.seq = 0
+        self.pending = []
+        self.gun = Cannon()
+        self.bytes_received = 0
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host, port):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        welcome = await receive(self.reader)
+        self.slot = welcome['slot']
+
+    def send_input(self, move=(0, 0), aim=None, charge=False, fire=False):
+        '''
+        Sends one input to the server and applies it to the predicted gun right away.
+        '''
+        self.seq += 1
+        inp = {'q': self.seq, 'm': list(move), 'a': None if aim is None else list(aim), 'c': charge, 'f': fire}
+        predict_input(self.gun, inp)
+        self.pending.append(inp)
+        send(self.writer, inp)
+
+    def apply(self, message):
+        '''
+        Applies a snapshot delta and corrects the predicted gun.
+        '''
+        self.tick = message['t']
+        self.state.update(message['s'])
+        for key in message.get('d', ()):
+            del self.state[key]
+        self.pending = [inp for inp in self.pending if inp['q'] > message['a']]
+        own = self.state.get('g{}'.format(self.slot))
+        if own is not None:
+            set_gun_state(self.gun, own)
+            for inp in self.pending:
+                predict_input(self.gun, inp)
+
+    async def listen(self):
+        '''
+        Applies snapshots until the server closes the connection.
+        '''
+        try:
+            while True:
+                size, = FRAME.unpack(await self.reader.readexactly(FRAME.size))
+                data = await self.reader.readexactly(size)
+                self.bytes_received += FRAME.size + size
+                self.apply(json.loads(data))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def draw(self, screen):
+        '''
+        Draws the state got from the server, with the own gun where the prediction puts it.
+        '''
+        screen.fill(BLACK)
+        sprites = []
+        for key, value in self.state.items():
+            if key[0] in 'beto':
+                x, y, rad, sides, color = value
+                sprites.append(shape_cache.item(sides, rad, color, (x, y)))
+        screen.blits(sprites, doreturn=False)
+        for slot, color in enumerate((RED, BLUE)):
+            gun = self.gun
+            if slot != self.slot:
+                if 'g{}'.format(slot) not in self.state:
+                    continue
+                gun = Cannon()
+                set_gun_state(gun, self.state['g{}'.format(slot)])
+            pg.draw.polygon(screen, color, gun.get_shape_points())
+
+
+async def bot(client, seconds, tick_rate=TICK_RATE, seed=None):
+    '''
+    Simulated player: moves around, aims at random points and charges and fires every couple of ticks.
+    '''
+    rng = random.Random(seed)
+    end = time.perf_counter() + seconds
+    charging = 0
+    while time.perf_counter() < end:
+        move = (rng.choice((-5, 0, 5)), rng.choice((-5, 0, 5)))
+        aim = (rng.randrange(SCREEN_SIZE[0]), rng.randrange(SCREEN_SIZE[1]))
+        charging += 1
+        fire = charging >= rng.randint(5, 20)
+        if fire:
+            charging = 0
+        client.send_input(move, aim, charge=charging == 1, fire=fire)
+        await asyncio.sleep(1 / tick_rate)
+
+
+async def bench(n_clients, seconds, tick_rate=TICK_RATE):
+    '''
+    Runs a server and n simulated clients over localhost, returns the server's stats
+    and the bytes every client received per second.
+    '''
+    server = Server(tick_rate=tick_rate)
+    await server.start()
+    clients = [Client() for i in range(n_clients)]
+    for client in clients:
+        await client.connect('127.0.0.1', server.port)
+    listeners = [asyncio.create_task(client.listen()) for client in clients]
+    await asyncio.gather(*[bot(client, seconds, tick_rate, seed=i) for i, client in enumerate(clients)])
+    stats = server.stats()
+    for client in clients:
+        client.close()
+    await server.stop()
+    await asyncio.gather(*listeners, return_exceptions=True)
+    stats['bytes_received_per_client_s'] = sum(client.bytes_received for client in clients) / n_clients / seconds
+    return stats
+
+
+async def serve(host, port, tick_rate=TICK_RATE):
+    server = Server(host, port, tick_rate)
+    await server.start()
+    print('serving on {}:{}'.format(host, server.port))
+    await server.loop_task
+
+
+async def play(host, port):
+    '''
+    Joins a server with a window: the mouse aims, holding the left button charges, arrows move the gun.
+    '''
+    from loop_runner import LoopRunner
+    if os.environ.get("SDL_VIDEODRIVER") == "dummy":
+        os.environ.pop("SDL_VIDEODRIVER")
+        pg.display.quit()
+        pg.display.init()
+    screen = pg.display.set_mode(SCREEN_SIZE)
+    pg.display.set_caption("The gun of Khiryanov, online")
+    client = Client()
+    await client.connect(host, port)
+    listener = asyncio.create_task(client.listen())
+    keys = {pg.K_LEFT: (-5, 0), pg.K_RIGHT: (5, 0), pg.K_UP: (0, -5), pg.K_DOWN: (0, 5)}
+    inputs = []
+
+    def handle(events):
+        for event in events:
+            if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
+                return True
+            if event.type == pg.KEYDOWN and event.key in keys:
+                inputs.append({'move': keys[event.key]})
+            elif event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+                inputs.append({'charge': True})
+            elif event.type == pg.MOUSEBUTTONUP and event.button == 1:
+                inputs.append({'fire': True})
+        return listener.done()
+
+    def tick():
+        aim = pg.mouse.get_pos() if pg.mouse.get_focused() else None
+        for inp in inputs or [{}]:
+            client.send_input(aim=aim, **inp)
+        inputs.clear()
+
+    def draw(alpha):
+        client.draw(screen)
+        pg.display.update()
+
+    runner = LoopRunner(tick_rate=TICK_RATE, fps=60)
+    await runner.run(handle, tick, draw)
+    client.close()
+    listener.cancel()
+    pg.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Client/server mode of the cannon game.')
+    parser.add_argument('mode', choices=['serve', 'play', 'bench'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE)
+    parser.add_argument('--clients', type=int, nargs='+', default=[2, 8, 32], help='bench: numbers of bots')
+    parser.add_argument('--seconds', type=float, default=5, help='bench: seconds every run lasts')
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        asyncio.run(serve(args.host, args.port, args.tick_rate))
+    elif args.mode == 'play':
+        asyncio.run(play(args.host, args.port))
+    else:
+        print('{:>8} {:>8} {:>12} {:>12} {:>14}'.format('clients', 'matches', 'tick p50 ms', 'tick p99 ms', 'bytes/player/s'))
+        for n in args.clients:
+            stats = asyncio.run(bench(n, args.seconds, args.tick_rate))
+            print('{:8d} {:8d} {:12.3f} {:12.3f} {:14.0f}'.format(
+                n, stats['matches'], stats['tick_p50_ms'], stats['tick_p99_ms'], stats['bytes_per_player_s']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import csv
+import json
+import time
+
+import numpy as np
+import pygame as pg
+
+PHASES = ('events', 'move', 'collide', 'draw')
+COUNTS = ('balls', 'enemy_balls', 'targets', 'bombs', 'pairs')
+
+
+class FrameProfiler:
+    '''
+    Frame profiler. Records wall time of every phase of a frame and the number of objects
+    into a ring buffer holding the last size - 1 frames, can show them on the screen
+    and export them to CSV or JSON.
+    '''
+    def __init__(self, size=600, overlay_every=15):
+        '''
+        Constructor method. Sets the number of frames kept and how often the overlay text is updated.
+        '''
+        self.times = np.zeros((size, len(PHASES)))
+        self.counts = np.zeros((size, len(COUNTS)), dtype=np.int64)
+        self.index = 0
+        self.frames = 0
+        self.last = time.perf_counter()
+        self.visible = False
+        self.overlay_every = overlay_every
+        self.overlay = None
+        self.font = None
+
+    def begin(self):
+        '''
+        Starts timing a frame.
+        '''
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        '''
+        Adds the time passed since the previous lap to the phase of the current frame.
+        '''
+        now = time.perf_counter()
+        self.times[self.index, PHASES.index(phase)] += now - self.last
+        self.last = now
+
+    def end_frame(self, mgr):
+        '''
+        Stores the object counts of the game manager and moves on to the next frame.
+        '''
+        self.counts[self.index] = (len(mgr.balls), len(mgr.enemy_balls), len(mgr.targets),
+                                   len(mgr.bombs), mgr.pairs_tested)
+        self.index = (self.index + 1) % len(self.times)
+        self.times[self.index] = 0
+        self.frames += 1
+
+    def rows(self):
+        '''
+        Returns (times, counts) of the recorded frames, oldest first.
+        '''
+        # the slot at index belongs to the frame in progress
+        n = min(self.frames, len(self.times) - 1)
+        order = (np.arange(self.index - n, self.index)) % len(self.times)
+        return self.times[order], self.counts[order]
+
+    def summary(self):
+        '''
+        Returns mean and 95th percentile of every phase in milliseconds and the last counts.
+        '''
+        times, counts = self.rows()
+        if len(times) == 0:
+            return {}
+        result = {}
+        for i, phase in enumerate(PHASES):
+            result[phase] = {'mean_ms': float(1000 * times[:, i].mean()),
+                             'p95_ms': float(1000 * np.percentile(times[:, i], 95))}
+        for i, name in enumerate(COUNTS):
+            result[name] = int(counts[-1, i])
+        return result
+
+    def export_csv(self, path):
+        '''
+        Writes one line per recorded frame: phase times in milliseconds and object counts.
+        '''
+        times, counts = self.rows()
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame'] + ['{}_ms'.format(phase) for phase in PHASES] + list(COUNTS))
+            first = self.frames - len(times)
+            for k in range(len(times)):
+                writer.writerow([first + k] + ['{:.4f}'.format(1000 * t) for t in times[k]]
+                                + counts[k].tolist())
+
+    def export_json(self, path):
+        '''
+        Writes the summary and the list of recorded frames.
+        '''
+        times, counts = self.rows()
+        first = self.frames - len(times)
+        frames = []
+        for k in range(len(times)):
+            row = {'frame': first + k}
+            row.update({phase + '_ms': float(1000 * times[k, i]) for i, phase in enumerate(PHASES)})
+            row.update({name: int(counts[k, i]) for i, name in enumerate(COUNTS)})
+            frames.append(row)
+        with open(path, 'w') as file:
+            json.dump({'summary': self.summary(), 'frames': frames}, file, indent=1)
+
+    def export(self, path):
+        '''
+        Exports the recorded frames, to JSON if the file name ends with .json and to CSV otherwise.
+        '''
+        if path.endswith('.json'):
+            self.export_json(path)
+        else:
+            self.export_csv(path)
+
+    def draw(self, screen):
+        '''
+        Draws the overlay in the top right corner, if it's visible. Returns the rect it covers or None.
+        The text is only rendered again every overlay_every frames.
+        '''
+        if not self.visible:
+            return None
+        if self.overlay is None or self.frames % self.overlay_every == 0:
+            if self.font is None:
+                self.font = pg.font.SysFont("dejavusansmono", 14)
+            summary = self.summary()
+            lines = ['{:8} {:6.2f} ms'.format(phase, summary[phase]['mean_ms']) for phase in PHASES if summary]
+            lines += ['{:8} {:6d}'.format(name, summary[name]) for name in COUNTS if summary]
+            surfs = [self.font.render(line, True, (255, 255, 0)) for line in lines]
+            width = max([surf.get_width() for surf in surfs], default=1) + 10
+            self.overlay = pg.Surface((width, 16 * len(surfs) + 10))
+            self.overlay.blits([(surf, (5, 5 + 16 * i)) for i, surf in enumerate(surfs)], doreturn=False)
+        rect = self.overlay.get_rect(topright=(screen.get_width() - 10, 10))
+        screen.blit(self.overlay, rect)
+        return rect
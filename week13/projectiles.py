@@ -0,0 +1,175 @@
+import numpy as np
+
+import integrators
+from render_cache import shape_cache
+
+
+class ShellPool:
+    '''
+    Projectile store. Keeps positions, velocities, radii and alive flags of all shells
+    in contiguous numpy arrays (structure of arrays), so the whole pool moves in one step.
+    '''
+    def __init__(self, bounds, capacity=64, integrator=None, max_travel=None, max_substeps=16):
+        '''
+        Constructor method. Sets the screen bounds and allocates arrays for capacity shells.
+        Without an integrator shells move in whole velocity steps with integer velocities, like Shell.move.
+        With one (see integrators.INTEGRATORS) they move on floats, in as many substeps as needed
+        for no shell to move further than max_travel in one substep, the smallest radius by default.
+        '''
+        self.bounds = np.array(bounds, dtype=float)
+        self.integrator = None if integrator is None else integrators.get(integrator)
+        self.max_travel = max_travel
+        self.max_substeps = max_substeps
+        self.coord = np.zeros((capacity, 2))
+        # coordinates before the last move, for swept collision tests
+        self.prev = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.rad = np.zeros(capacity)
+        self.alive = np.zeros(capacity, dtype=bool)
+        # colors and number of sides are only needed for drawing, so they stay in plain lists
+        self.color = []
+        self.sides = []
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def grow(self):
+        '''
+        Doubles the capacity of the arrays.
+        '''
+        capacity = 2 * len(self.rad)
+        for name in ('coord', 'prev', 'vel', 'rad', 'alive'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def append(self, shell):
+        '''
+        Copies shell's parameters into the next free slot of the pool. The shell itself
+        isn't kept, whoever created it can reuse or release it.
+        '''
+        if self.n == len(self.rad):
+            self.grow()
+        i = self.n
+        self.coord[i] = shell.coord
+        self.prev[i] = shell.coord
+        self.vel[i] = shell.vel
+        self.rad[i] = shell.rad
+        self.alive[i] = True
+        self.color.append(shell.color)
+        self.sides.append(shell.sides)
+        self.n += 1
+
+    def live(self):
+        '''
+        Returns views of the coordinates and radii of the shells in use.
+        '''
+        return self.coord[:self.n], self.rad[:self.n]
+
+    def path(self):
+        '''
+        Returns views of the coordinates before and after the last move of the shells in use.
+        '''
+        return self.prev[:self.n], self.coord[:self.n]
+
+    def check_corners(self, refl_ort=0.8, refl_par=0.9, truncate=True):
+        '''
+        Reflects velocities of the shells that bump into the screen corners. Same inelastic
+        rebounce as Shell.check_corners, x axis first and then y axis. Velocities are truncated
+        to whole numbers like there, unless truncate is False.
+        '''
+        coord = self.coord[:self.n]
+        vel = self.vel[:self.n]
+        rad = self.rad[:self.n]
+        for i in range(2):
+            low = rad
+            high = self.bounds[i] - rad
+            hit = (coord[:, i] < low) | (coord[:, i] > high)
+            # most of the time nobody touches the walls
+            if not hit.any():
+                continue
+            coord[:, i] = np.minimum(np.maximum(coord[:, i], low), high)
+            ort = vel[:, i] * refl_ort
+            par = vel[:, 1-i] * refl_par
+            if truncate:
+                # np.trunc rounds towards zero just like int() in Shell.check_corners
+                ort = np.trunc(ort)
+                par = np.trunc(par)
+            vel[:, i] = np.where(hit, -ort, vel[:, i])
+            vel[:, 1-i] = np.where(hit, par, vel[:, 1-i])
+
+    def move(self, time=1, grav=0):
+        '''
+        Moves all shells according to their velocities and time step,
+        applies gravity and marks the slow shells lying on the floor as dead.
+        '''
+        coord = self.coord[:self.n]
+        vel = self.vel[:self.n]
+        self.prev[:self.n] = coord
+        if self.integrator is None:
+            vel[:, 1] += grav
+            coord += time * vel
+            self.check_corners()
+        else:
+            self.integrate(time, grav)
+        slow = (vel**2).sum(axis=1) < 2**2
+        on_floor = coord[:, 1] > self.bounds[1] - 2*self.rad[:self.n]
+        self.alive[:self.n] &= ~(slow & on_floor)
+
+    def integrate(self, time, grav):
+        '''
+        Moves the shells with the pool's integrator, bouncing them off the walls after every substep.
+        '''
+        if self.n == 0:
+            return
+        coord = self.coord[:self.n]
+        vel = self.vel[:self.n]
+        gravity = np.array([0, grav], dtype=float)
+
+        def accel(coord, vel):
+            return gravity
+
+        max_travel = self.max_travel
+        if max_travel is None:
+            max_travel = self.rad[:self.n].min()
+        steps = integrators.substeps(vel, time, max_travel, self.max_substeps)
+        for i in range(steps):
+            self.integrator(coord, vel, accel, time / steps)
+            self.check_corners(truncate=False)
+
+    def remove_dead(self):
+        '''
+        Compacts the pool so that the alive shells occupy the first slots, keeping their order.
+        '''
+        keep = np.flatnonzero(self.alive[:self.n])
+        if len(keep) == self.n:
+            return
+        k = len(keep)
+        self.coord[:k] = self.coord[keep]
+        self.prev[:k] = self.prev[keep]
+        self.vel[:k] = self.vel[keep]
+        self.rad[:k] = self.rad[keep]
+        self.alive[:k] = True
+        self.alive[k:self.n] = False
+        self.color = [self.color[i] for i in keep]
+        self.sides = [self.sides[i] for i in keep]
+        self.n = k
+
+    def sprites(self, alpha=1):
+        '''
+        Returns cached (surface, position) pairs of all shells, ready for Surface.blits.
+        With alpha below 1 the shells are drawn that far between their last two positions.
+        '''
+        coord = self.coord[:self.n]
+        if alpha != 1:
+            coord = self.prev[:self.n] + alpha * (coord - self.prev[:self.n])
+        return [shape_cache.item(self.sides[i], self.rad[i], self.color[i], coord[i])
+                for i in range(self.n)]
+
+    def draw(self, screen):
+        '''
+        Draws all shells on appropriate surface.
+        '''
+        screen.blits(self.sprites(), doreturn=False)
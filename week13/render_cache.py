@@ -0,0 +1,85 @@
+import math
+import pygame as pg
+
+
+def shape_points(sides, rad, center):
+    '''
+    Returns vertices of a square (4 sides) or a regular polygon around center.
+    '''
+    x, y = center
+    if sides == 4:
+        return [(x - rad, y - rad), (x + rad, y - rad), (x + rad, y + rad), (x - rad, y + rad)]
+    angle = 2 * math.pi / sides
+    return [(x + int(rad * math.cos(i * angle)), y + int(rad * math.sin(i * angle))) for i in range(sides)]
+
+
+class ShapeCache:
+    '''
+    Render cache. Rasterizes every (sides, rad, color) shape once to a pygame.Surface,
+    after that drawing a shape is just a blit.
+    '''
+    def __init__(self, max_size=4096):
+        '''
+        Constructor method. Sets how many surfaces are kept before the cache is cleared.
+        '''
+        self.max_size = max_size
+        self.surfaces = {}
+
+    def get(self, sides, rad, color):
+        '''
+        Returns the surface of a shape, rasterizing it on first use.
+        '''
+        # 0,1,2 will draw a circle, 3 will draw a triangular shape, 4 will draw a square/rectangle
+        if sides not in (3, 4):
+            sides = 0
+        rad = int(rad)
+        key = (sides, rad, tuple(color))
+        surf = self.surfaces.get(key)
+        if surf is None:
+            if len(self.surfaces) >= self.max_size:
+                self.surfaces.clear()
+            surf = self.rasterize(sides, rad, color)
+            self.surfaces[key] = surf
+        return surf
+
+    @staticmethod
+    def margin(sides, rad):
+        '''
+        Returns the distance from the shape's center to the edge of its surface.
+        The thick outline of the triangle sticks out of its circle, so it gets more room.
+        '''
+        return rad + rad//2 + 1 if sides == 3 else rad + 1
+
+    def rasterize(self, sides, rad, color):
+        '''
+        Draws a shape in the middle of a new surface. The rest of the surface is a color key,
+        which blits a lot faster than per-pixel alpha.
+        '''
+        margin = self.margin(sides, rad)
+        center = (margin, margin)
+        key = (0, 0, 0) if tuple(color) != (0, 0, 0) else (255, 255, 255)
+        surf = pg.Surface((2*margin + 1, 2*margin + 1))
+        surf.fill(key)
+        if sides == 4:
+            pg.draw.polygon(surf, color, shape_points(sides, rad, center))
+        elif sides == 3:
+            pg.draw.polygon(surf, color, shape_points(sides, rad, center), rad)
+        else:
+            pg.draw.circle(surf, color, center, rad)
+        if pg.display.get_surface() is not None:
+            # same pixel format as the screen, so blitting needs no conversion
+            surf = surf.convert()
+        surf.set_colorkey(key, pg.RLEACCEL)
+        return surf
+
+    def item(self, sides, rad, color, coord):
+        '''
+        Returns a (surface, position) pair ready for Surface.blit or Surface.blits.
+        '''
+        surf = self.get(sides, rad, color)
+        # the shape's center is in the middle of its surface
+        offset = surf.get_width() // 2
+        return surf, (int(coord[0]) - offset, int(coord[1]) - offset)
+
+
+shape_cache = ShapeCache()
@@ -0,0 +1,195 @@
+import argparse
+import pickle
+import random
+import struct
+import time
+
+import pygame as pg
+
+MAGIC = b'CNRP'
+VERSION = 2
+# magic, version, seed, number of targets, flags
+HEADER = struct.Struct('<4sHIHB')
+# tick, kind, key or button, x, y
+RECORD = struct.Struct('<IBiHH')
+
+AIM, NO_AIM, QUIT, KEYDOWN, MOUSEBUTTONDOWN, MOUSEBUTTONUP, END = range(7)
+EVENT_KINDS = {pg.QUIT: QUIT, pg.KEYDOWN: KEYDOWN,
+               pg.MOUSEBUTTONDOWN: MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP: MOUSEBUTTONUP}
+ENEMY_AIMING = 1
+CONTINUOUS = 2
+# marks ticks where the aim position didn't change
+KEEP_AIM = ()
+
+
+class Recorder:
+    '''
+    Writes the seed and the input of a game into a compact binary file. Every input event
+    and every change of the aim position is one fixed size record tagged with its tick.
+    '''
+    def __init__(self, path, seed, n_targets=4, enemy_aiming=False, continuous=False):
+        '''
+        Constructor method. Opens the file and writes the header.
+        '''
+        flags = (ENEMY_AIMING if enemy_aiming else 0) | (CONTINUOUS if continuous else 0)
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, n_targets, flags))
+        self.tick = 0
+        self.aim = None
+
+    def record(self, events, aim=None):
+        '''
+        Records the events and the aim position of one tick.
+        '''
+        if aim != self.aim:
+            if aim is None:
+                self.file.write(RECORD.pack(self.tick, NO_AIM, 0, 0, 0))
+            else:
+                self.file.write(RECORD.pack(self.tick, AIM, 0, aim[0], aim[1]))
+            self.aim = aim
+        for event in events:
+            kind = EVENT_KINDS.get(event.type)
+            if kind == KEYDOWN:
+                self.file.write(RECORD.pack(self.tick, kind, event.key, 0, 0))
+            elif kind in (MOUSEBUTTONDOWN, MOUSEBUTTONUP):
+                self.file.write(RECORD.pack(self.tick, kind, event.button, event.pos[0], event.pos[1]))
+            elif kind == QUIT:
+                self.file.write(RECORD.pack(self.tick, kind, 0, 0, 0))
+        self.tick += 1
+
+    def close(self):
+        self.file.write(RECORD.pack(self.tick, END, 0, 0, 0))
+        self.file.close()
+
+
+class Replay:
+    '''
+    Plays a recorded game again headlessly, as fast as possible. Every snapshot_every ticks
+    the state is saved, so seek() can jump to any tick without playing from the start.
+    '''
+    def __init__(self, seed, n_targets, enemy_aiming, continuous, inputs, length, snapshot_every=500):
+        '''
+        Constructor method. inputs maps a tick to its (events, aim) pair, where aim is a position,
+        None when the mouse left the window, or KEEP_AIM.
+        '''
+        self.seed = seed
+        self.n_targets = n_targets
+        self.enemy_aiming = enemy_aiming
+        self.continuous = continuous
+        self.inputs = inputs
+        self.length = length
+        self.snapshot_every = snapshot_every
+        self.snapshots = {}
+        self.restart()
+
+    @classmethod
+    def load(cls, path, snapshot_every=500):
+        '''
+        Reads a file written by Recorder.
+        '''
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, version, seed, n_targets, flags = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a replay of version {}".format(path, VERSION))
+        inputs = {}
+        length = 0
+        for tick, kind, a, x, y in RECORD.iter_unpack(data[HEADER.size:]):
+            length = max(length, tick)
+            if kind == END:
+                break
+            events, aim = inputs.get(tick, ([], KEEP_AIM))
+            if kind == AIM:
+                aim = (x, y)
+            elif kind == NO_AIM:
+                aim = None
+            elif kind == QUIT:
+                events.append(pg.event.Event(pg.QUIT))
+            elif kind == KEYDOWN:
+                events.append(pg.event.Event(pg.KEYDOWN, key=a))
+            elif kind == MOUSEBUTTONDOWN:
+                events.append(pg.event.Event(pg.MOUSEBUTTONDOWN, button=a, pos=(x, y)))
+            elif kind == MOUSEBUTTONUP:
+                events.append(pg.event.Event(pg.MOUSEBUTTONUP, button=a, pos=(x, y)))
+            inputs[tick] = (events, aim)
+        return cls(seed, n_targets, bool(flags & ENEMY_AIMING), bool(flags & CONTINUOUS),
+                   inputs, length, snapshot_every)
+
+    def restart(self):
+        '''
+        Starts the game from the beginning with the recorded seed.
+        '''
+        # imported here, because cannon imports this module for the Recorder
+        from simulation import Simulation
+        self.sim = Simulation(n_targets=self.n_targets, seed=self.seed, enemy_aiming=self.enemy_aiming,
+                              continuous=self.continuous)
+        self.mgr = self.sim.mgr
+        self.tick = 0
+        # the gun keeps pointing where the mouse was, like in the live game
+        self.aim = None
+        self.done = False
+
+    def snapshot(self):
+        '''
+        Saves the state of the game, the random generator and the aim at the current tick.
+        '''
+        self.snapshots[self.tick] = pickle.dumps((self.mgr, random.getstate(), self.aim, self.done))
+
+    def restore(self, tick):
+        '''
+        Goes back to the snapshot saved at the given tick.
+        '''
+        self.mgr, state, self.aim, self.done = pickle.loads(self.snapshots[tick])
+        self.sim.mgr = self.mgr
+        random.setstate(state)
+        self.tick = tick
+
+    def step(self):
+        '''
+        Plays one recorded tick.
+        '''
+        if self.tick % self.snapshot_every == 0 and self.tick not in self.snapshots:
+            self.snapshot()
+        events, aim = self.inputs.get(self.tick, ((), KEEP_AIM))
+        if aim is not KEEP_AIM:
+            self.aim = aim
+        self.done = self.mgr.advance(events, self.aim) or self.done
+        self.tick += 1
+
+    def run(self, until=None):
+        '''
+        Plays until the given tick or the end of the recording.
+        '''
+        until = self.length if until is None else min(until, self.length)
+        while self.tick < until and not self.done:
+            self.step()
+
+    def seek(self, tick):
+        '''
+        Jumps to the given tick from the closest snapshot before it.
+        '''
+        start = max([t for t in self.snapshots if t <= tick], default=None)
+        if start is None:
+            self.restart()
+        elif not (start <= self.tick <= tick):
+            self.restore(start)
+        self.run(tick)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plays a recorded game headlessly.')
+    parser.add_argument('path')
+    parser.add_argument('--seek', type=int, help='tick to stop at')
+    args = parser.parse_args()
+
+    replay = Replay.load(args.path)
+    start = time.perf_counter()
+    replay.run(args.seek)
+    elapsed = time.perf_counter() - start
+    score_t = replay.mgr.score_t
+    print('tick {} of {}, {:.0f} ticks/s'.format(replay.tick, replay.length, replay.tick / max(elapsed, 1e-9)))
+    print('destroyed {}, balls used {}, total {}'.format(score_t.t_destr, score_t.b_used, score_t.score()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import random
+
+# the simulation never opens a window, so pygame gets a dummy video driver
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from cannon import Manager
+
+TICK_RATE = 15  # ticks per second of game time, same pace as the windowed game
+
+
+class Simulation:
+    '''
+    Headless simulation core. Steps Manager's move/collide/new_mission logic
+    with a fixed timestep, without a display and without a frame rate cap.
+    Rendering is optional: anything can draw the current state with render().
+    '''
+    def __init__(self, n_targets=4, tick_rate=TICK_RATE, seed=None, target_rad=None,
+                 enemy_aiming=False, continuous=False, integrator=None):
+        '''
+        Constructor method. Seeds the random generator and creates the game manager.
+        '''
+        if seed is not None:
+            random.seed(seed)
+        self.mgr = Manager(n_targets=n_targets, target_rad=target_rad, enemy_aiming=enemy_aiming,
+                           continuous=continuous, integrator=integrator)
+        self.dt = 1 / tick_rate
+        self.tick = 0
+
+    @property
+    def time(self):
+        '''
+        Game time in seconds since the start of the simulation.
+        '''
+        return self.tick * self.dt
+
+    def aim(self, target_pos):
+        '''
+        Turns the user's gun to the target position.
+        '''
+        self.mgr.gun.set_angle(target_pos)
+
+    def fire(self, pow=None):
+        '''
+        Strikes with the given power, or with the power charged so far.
+        '''
+        if pow is not None:
+            self.mgr.gun.pow = pow
+        self.mgr.fire()
+
+    def tick_once(self):
+        '''
+        Makes one step of the game, timed by the manager's profiler if it has one.
+        '''
+        profiler = self.mgr.profiler
+        if profiler is None:
+            self.mgr.step()
+        else:
+            profiler.begin()
+            self.mgr.step()
+            profiler.end_frame(self.mgr)
+        self.tick += 1
+
+    def step(self, n=1):
+        '''
+        Advances the game by n fixed ticks.
+        '''
+        for i in range(n):
+            self.tick_once()
+
+    def run(self, ticks, until_idle=False):
+        '''
+        Runs the simulation for the given number of ticks. With until_idle it stops
+        earlier, as soon as all the balls are gone.
+        '''
+        for i in range(ticks):
+            self.tick_once()
+            if until_idle and len(self.mgr.balls) == 0:
+                break
+
+    def render(self, screen):
+        '''
+        Draws the current state on any surface, e.g. an offscreen pygame.Surface.
+        '''
+        self.mgr.draw(screen)
@@ -0,0 +1,136 @@
+import numpy as np
+
+
+class SpatialHash:
+    '''
+    Uniform grid broad phase. Objects are hashed into square cells by their centers,
+    so a query only looks at the cells around each circle instead of at every object.
+    '''
+    def __init__(self, cell_size=64, brute_force_pairs=1024):
+        '''
+        Constructor method. Sets the size of a grid cell in pixels and the number of pairs
+        below which all pairs are tested directly.
+        '''
+        self.cell_size = cell_size
+        self.brute_force_pairs = brute_force_pairs
+        self.coord = np.zeros((0, 2))
+        self.rad = np.zeros(0)
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.max_rad = 0
+        # number of candidate pairs of the last pairs() call
+        self.pairs_tested = 0
+
+    def cells(self, coord):
+        '''
+        Returns grid cell indices of the given points.
+        '''
+        return np.floor_divide(coord, self.cell_size).astype(np.int64)
+
+    @staticmethod
+    def hash(cx, cy):
+        '''
+        Packs cell indices into one integer key. Different cells may share a key,
+        that only adds candidates which the exact test throws away.
+        '''
+        return cx * 0x100000 + cy
+
+    def build(self, coord, rad):
+        '''
+        Rebuilds the grid from circles' coordinates and radii. Should be called every tick.
+        '''
+        self.coord = np.asarray(coord, dtype=float).reshape(-1, 2)
+        self.rad = np.asarray(rad, dtype=float).reshape(-1)
+        cells = self.cells(self.coord)
+        keys = self.hash(cells[:, 0], cells[:, 1])
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.max_rad = self.rad.max() if len(self.rad) else 0
+
+    def candidates(self, coord, rad):
+        '''
+        Broad phase. Returns index arrays (i, j) of query circles i and grid circles j
+        which are close enough to overlap.
+        '''
+        coord = np.asarray(coord, dtype=float).reshape(-1, 2)
+        rad = np.asarray(rad, dtype=float).reshape(-1)
+        empty = np.zeros(0, dtype=np.int64)
+        if len(coord) == 0 or len(self.keys) == 0:
+            return empty, empty
+        if len(coord) * len(self.keys) <= self.brute_force_pairs:
+            # for a handful of objects testing all pairs is cheaper than walking the cells
+            i, j = np.indices((len(coord), len(self.keys)))
+            return i.ravel(), j.ravel()
+        # how many neighbouring cells a circle can reach into
+        reach = int(np.ceil((rad.max() + self.max_rad) / self.cell_size))
+        cells = self.cells(coord)
+        query_i = []
+        grid_j = []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                keys = self.hash(cells[:, 0] + dx, cells[:, 1] + dy)
+                start = np.searchsorted(self.keys, keys, side='left')
+                stop = np.searchsorted(self.keys, keys, side='right')
+                count = stop - start
+                total = count.sum()
+                if total == 0:
+                    continue
+                # expands every [start, stop) range into the list of grid slots
+                i = np.repeat(np.arange(len(coord)), count)
+                offset = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+                query_i.append(i)
+                grid_j.append(self.order[np.repeat(start, count) + offset])
+        if not query_i:
+            return empty, empty
+        return np.concatenate(query_i), np.concatenate(grid_j)
+
+    def pairs(self, start, end, rad):
+        '''
+        Collides a set of circles with itself. Every circle moves from start to end during the tick,
+        with end None all of them stand still at start and only overlaps are tested. Rebuilds the grid
+        from the circles and returns index arrays (i, j), i < j, of the pairs that touch, with their
+        earliest time of impact t.
+        '''
+        start = np.asarray(start, dtype=float).reshape(-1, 2)
+        rad = np.asarray(rad, dtype=float).reshape(-1)
+        if end is None:
+            middle, reach = start, rad
+        else:
+            move = np.asarray(end, dtype=float).reshape(-1, 2) - start
+            # broad phase: every circle is grown to cover its whole path
+            middle = start + move / 2
+            reach = rad + np.sqrt((move**2).sum(axis=1)) / 2
+        self.build(middle, reach)
+        # querying in the grid's own order makes searchsorted walk the keys almost sequentially
+        i, j = self.candidates(middle[self.order], reach[self.order])
+        i = self.order[i]
+        keep = i < j
+        i, j = i[keep], j[keep]
+        self.pairs_tested = len(i)
+        if end is None:
+            # squared distances, so no square roots are taken
+            dist2 = ((start[i] - start[j])**2).sum(axis=1)
+            hit = dist2 <= (rad[i] + rad[j])**2
+            return i[hit], j[hit], np.zeros(np.count_nonzero(hit))
+        # narrow phase in the frame of circle j, so both of them may move
+        hit, t = time_of_impact(start[i] - start[j], move[i] - move[j], rad[i] + rad[j])
+        return i[hit], j[hit], t[hit]
+
+
+def time_of_impact(f, d, dist):
+    '''
+    Narrow phase of the swept test of SpatialHash.pairs. A circle center starts at offset f from the other center
+    and moves by d during the tick. Returns a mask of the pairs which come closer than dist
+    and the earliest time t, 0 <= t <= 1, at which that happens: |f + t*d|**2 = dist**2.
+    '''
+    a = (d**2).sum(axis=1)
+    b = 2 * (f * d).sum(axis=1)
+    c = (f**2).sum(axis=1) - dist**2
+    disc = b**2 - 4*a*c
+    # circles that don't move relative to each other only touch if they already do
+    t = np.divide(-b - np.sqrt(np.maximum(disc, 0)), 2*a, out=np.zeros_like(a), where=a > 0)
+    touching = c <= 0
+    # already touching at the start of the tick
+    t[touching] = 0
+    hit = touching | ((disc >= 0) & (a > 0) & (t >= 0) & (t <= 1))
+    return hit, t
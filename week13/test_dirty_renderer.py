@@ -0,0 +1,71 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame as pg
+
+from cannon import SCREEN_SIZE, BLACK
+from dirty_renderer import DirtyRenderer
+from simulation import Simulation
+
+
+def full_redraw(screen, mgr, alpha, aim):
+    '''
+    Draws the whole frame from scratch, the reference for the dirty renderer.
+    '''
+    screen.fill(BLACK)
+    for rect, what in DirtyRenderer(screen).collect(mgr, alpha, aim).values():
+        if isinstance(what[0], pg.Surface):
+            screen.blit(*what)
+        else:
+            pg.draw.polygon(screen, *what)
+
+
+def test_dirty_frames_match_full_redraws(ticks=150):
+    '''
+    Renders a game with moving targets and shells with the dirty renderer, several frames
+    per tick between the ticks, and compares every frame pixel by pixel with a full redraw.
+    '''
+    sim = Simulation(n_targets=10, seed=2)
+    dirty = pg.Surface(SCREEN_SIZE)
+    full = pg.Surface(SCREEN_SIZE)
+    renderer = DirtyRenderer(dirty, BLACK)
+    partial = 0
+    for tick in range(ticks):
+        if tick % 7 == 0:
+            sim.aim((300 + tick, 500))
+            sim.fire(45)
+        sim.mgr.gun.gain()
+        sim.step()
+        for alpha in (0.25, 0.5, 1):
+            # the mouse moves between the ticks, the gun is drawn turned to it
+            aim = (400 + (10 * tick) % 300, int(600 * alpha) - 1)
+            if renderer.render(sim.mgr, alpha, aim) != [dirty.get_rect()]:
+                partial += 1
+            full_redraw(full, sim.mgr, alpha, aim)
+            diff = pg.surfarray.array3d(dirty) != pg.surfarray.array3d(full)
+            assert not diff.any(), (tick, alpha)
+    # most frames redraw the whole screen, but the dirty rectangles have to be tested too
+    assert partial > 0
+
+
+def test_full_redraw_matches_manager_draw():
+    '''
+    Without interpolation the reference frame is what Manager.draw puts on the screen.
+    '''
+    sim = Simulation(n_targets=20, seed=3)
+    sim.aim((500, 300))
+    sim.fire(40)
+    sim.step(5)
+    drawn = pg.Surface(SCREEN_SIZE)
+    full = pg.Surface(SCREEN_SIZE)
+    drawn.fill(BLACK)
+    sim.render(drawn)
+    full_redraw(full, sim.mgr, 1, None)
+    assert (pg.surfarray.array3d(drawn) == pg.surfarray.array3d(full)).all()
+
+
+if __name__ == "__main__":
+    test_dirty_frames_match_full_redraws()
+    test_full_redraw_matches_manager_draw()
+    print('ok')
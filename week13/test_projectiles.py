@@ -0,0 +1,48 @@
+import os
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from cannon import Shell, SCREEN_SIZE
+from projectiles import ShellPool
+
+
+def test_pool_moves_like_shells(n=50, ticks=100, seed=1):
+    '''
+    Moves the same shells one by one with Shell.move and all at once in a ShellPool,
+    and checks that both keep exactly the same coordinates, velocities and living shells.
+    '''
+    rng = random.Random(seed)
+    shells = [Shell([rng.randint(30, 770), rng.randint(30, 570)], [rng.randint(-50, 50), rng.randint(-50, 50)])
+              for i in range(n)]
+    # a small capacity, so the pool has to grow on the way
+    pool = ShellPool(SCREEN_SIZE, capacity=4)
+    for shell in shells:
+        pool.append(shell)
+    for tick in range(ticks):
+        for shell in shells:
+            shell.move(grav=2)
+        pool.move(grav=2)
+        shells = [shell for shell in shells if shell.is_alive]
+        pool.remove_dead()
+        assert len(pool) == len(shells), tick
+        assert pool.coord[:len(pool)].tolist() == [shell.coord for shell in shells], tick
+        assert pool.vel[:len(pool)].tolist() == [shell.vel for shell in shells], tick
+
+
+def test_empty_pool():
+    '''
+    An empty pool moves, removes and draws nothing, with and without an integrator.
+    '''
+    for integrator in (None, 'rk4'):
+        pool = ShellPool(SCREEN_SIZE, integrator=integrator)
+        pool.move(grav=2)
+        pool.remove_dead()
+        assert len(pool) == 0
+        assert pool.sprites() == []
+
+
+if __name__ == "__main__":
+    test_pool_moves_like_shells()
+    test_empty_pool()
+    print('ok')
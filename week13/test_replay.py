@@ -0,0 +1,81 @@
+import os
+import random
+import tempfile
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame as pg
+
+from cannon import Manager
+from replay import Recorder, Replay
+
+
+def state(mgr):
+    '''
+    Returns what a replay has to repeat exactly: scores, shells, targets, bombs and guns.
+    Coordinates are copied, the game keeps changing its lists in place.
+    '''
+    return (mgr.score_t.t_destr, mgr.score_t.b_used, mgr.score_t.hits,
+            mgr.balls.coord[:len(mgr.balls)].tolist(), mgr.enemy_balls.coord[:len(mgr.enemy_balls)].tolist(),
+            [list(target.coord) for target in mgr.targets], [list(bomb.coord) for bomb in mgr.bombs],
+            list(mgr.gun.coord), float(mgr.gun.angle), mgr.gun.pow, list(mgr.enemy_cannon.coord))
+
+
+def play(path, seed=1234, ticks=3000, checkpoint=1700):
+    '''
+    Plays a scripted session with random key presses, shots and mouse moves and records it.
+    Returns the states after the checkpoint tick and at the end.
+    '''
+    random.seed(seed)
+    mgr = Manager(n_targets=4)
+    recorder = Recorder(path, seed, n_targets=4)
+    rng = np.random.default_rng(0)
+    keys = [pg.K_UP, pg.K_DOWN, pg.K_LEFT, pg.K_RIGHT]
+    aim = None
+    for tick in range(ticks):
+        events = []
+        if rng.random() < 0.05:
+            events.append(pg.event.Event(pg.KEYDOWN, key=keys[rng.integers(len(keys))]))
+        if tick % 20 == 0:
+            events.append(pg.event.Event(pg.MOUSEBUTTONDOWN, button=1, pos=(1, 2)))
+        if tick % 20 == 10:
+            pos = (int(rng.integers(0, 800)), int(rng.integers(0, 600)))
+            events.append(pg.event.Event(pg.MOUSEBUTTONUP, button=1, pos=pos))
+        if rng.random() < 0.3:
+            aim = (int(rng.integers(0, 800)), int(rng.integers(0, 600)))
+        elif rng.random() < 0.02:
+            aim = None
+        recorder.record(events, aim)
+        mgr.advance(events, aim)
+        if tick + 1 == checkpoint:
+            middle = state(mgr)
+    recorder.close()
+    return middle, state(mgr)
+
+
+def test_replay_repeats_the_game():
+    '''
+    A recorded session played again ends in the same state, and seeking back and forth
+    from snapshots reaches the same states as playing from the start.
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.rpl')
+        middle, final = play(path)
+        replay = Replay.load(path)
+    replay.run()
+    assert replay.tick == 3000
+    assert state(replay.mgr) == final
+    # the session has to do something, or there is nothing to compare
+    assert final[0] > 0 and final[1] > 0
+    replay.seek(1700)
+    assert state(replay.mgr) == middle
+    replay.seek(3000)
+    assert state(replay.mgr) == final
+    replay.seek(1700)
+    assert state(replay.mgr) == middle
+
+
+if __name__ == "__main__":
+    test_replay_repeats_the_game()
+    print('ok')
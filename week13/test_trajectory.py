@@ -0,0 +1,56 @@
+import numpy as np
+
+import trajectory
+
+SCREEN_SIZE = (800, 600)
+
+
+def simulate(angle, pow, origin, targets, target_rad, grav=2, rad=20, max_ticks=200):
+    '''
+    Flies one shot tick by tick the way Shell.move does, until it first touches a wall.
+    Returns the landing point, the time of flight, the first target hit and the tick of that hit.
+    '''
+    vx, vy = trajectory.launch_velocity(angle, pow)
+    coord = np.array(origin, dtype=float)
+    vel = np.array([vx, vy])
+    low = np.array([rad, rad])
+    high = np.array(SCREEN_SIZE) - rad
+    hit, hit_time = -1, -1
+    for tick in range(1, max_ticks + 1):
+        vel[1] += grav
+        coord += vel
+        # the wall stops the shell where it touches it
+        landing = np.minimum(np.maximum(coord, low), high)
+        if hit < 0:
+            near = np.flatnonzero(((landing - targets)**2).sum(axis=1) <= (rad + target_rad)**2)
+            if len(near):
+                hit, hit_time = near[0], tick
+        if (landing != coord).any():
+            break
+    return landing, tick, hit, hit_time
+
+
+def test_solve_matches_simulation(n=500, seed=0):
+    '''
+    Solves many random shots at once and flies each of them again tick by tick.
+    '''
+    rng = np.random.default_rng(seed)
+    angle = rng.uniform(-np.pi, np.pi, n)
+    pow = rng.integers(10, 51, n)
+    origin = np.stack([rng.integers(30, 770, n), rng.integers(30, 570, n)], axis=1)
+    targets = rng.uniform(0, 800, (8, 2))
+    target_rad = rng.integers(1, 30, 8)
+    res = trajectory.solve(angle, pow, origin, SCREEN_SIZE, targets=targets, target_rad=target_rad)
+    # some shots have to hit, or the targets aren't tested at all
+    assert (res['target'] >= 0).any()
+    for i in range(n):
+        landing, tof, hit, hit_time = simulate(angle[i], pow[i], origin[i], targets, target_rad)
+        assert res['tof'][i] == tof, i
+        assert np.allclose(res['landing'][i], landing), i
+        assert res['target'][i] == hit, i
+        assert res['hit_time'][i] == hit_time, i
+
+
+if __name__ == "__main__":
+    test_solve_matches_simulation()
+    print('ok')
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+def launch_velocity(angle, pow):
+    '''
+    Returns integer velocity components of shells fired with the given angle and power,
+    the same way Cannon.strike computes them.
+    '''
+    angle = np.asarray(angle, dtype=float)
+    pow = np.asarray(pow, dtype=float)
+    return np.trunc(pow * np.cos(angle)), np.trunc(pow * np.sin(angle))
+
+
+def first_tick_after(a, b, c):
+    '''
+    Returns the first tick k >= 1 for which a*k**2 + b*k + c > 0, where a >= 0 and c <= 0,
+    i.e. the tick at which a shot crosses a line it started behind. Infinity if it never does.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if a > 0:
+            root = (-b + np.sqrt(b**2 - 4*a*c)) / (2*a)
+        else:
+            root = np.where(b > 0, -c / b, np.inf)
+    return np.maximum(np.floor(root) + 1, 1)
+
+
+def first_tick_before(a, b, c):
+    '''
+    Returns the first tick k >= 1 for which a*k**2 + b*k + c < 0, where a >= 0 and c >= 0.
+    Infinity if it never happens.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if a > 0:
+            # the parabola is negative only between its roots
+            disc = b**2 - 4*a*c
+            r1 = (-b - np.sqrt(np.maximum(disc, 0))) / (2*a)
+            r2 = (-b + np.sqrt(np.maximum(disc, 0))) / (2*a)
+            k = np.maximum(np.floor(r1) + 1, 1)
+            return np.where((disc > 0) & (k < r2), k, np.inf)
+        return np.where(b < 0, np.maximum(np.floor(-c / b) + 1, 1), np.inf)
+
+
+def solve(angle, pow, origin, bounds, grav=2, rad=20, targets=None, target_rad=None, max_ticks=200):
+    '''
+    Solves trajectories of many shots at once. angle, pow and origin are broadcast against each other,
+    origin has shape (..., 2). A shot flies like Shell.move does: each tick gravity (not negative)
+    is added to its integer velocity and it moves by the whole velocity step, until it first touches a wall.
+
+    Returns a dict of arrays:
+        landing - coordinates of the first wall contact, shape (n, 2)
+        tof - time of flight to the first wall contact in ticks
+        target - index of the first target hit before landing, -1 if there is none
+        hit_time - tick of that hit, -1 if there is none
+    '''
+    angle = np.asarray(angle, dtype=float)
+    pow = np.asarray(pow, dtype=float)
+    origin = np.asarray(origin, dtype=float)
+    angle, pow, x0, y0 = np.broadcast_arrays(angle, pow, origin[..., 0], origin[..., 1])
+    angle, pow, x0, y0 = angle.ravel(), pow.ravel(), x0.ravel(), y0.ravel()
+    vx, vy = launch_velocity(angle, pow)
+    low = np.array([rad, rad], dtype=float)
+    high = np.array(bounds, dtype=float) - rad
+
+    # y after k ticks is y0 + k*vy + grav*k*(k+1)/2 and x is x0 + k*vx,
+    # so the first contact with every wall is a root of a quadratic or linear equation
+    a = grav / 2
+    b = vy + grav / 2
+    floor = first_tick_after(a, b, y0 - high[1])
+    ceiling = first_tick_before(a, b, y0 - low[1])
+    right = first_tick_after(0, vx, x0 - high[0])
+    left = first_tick_after(0, -vx, low[0] - x0)
+    tof = np.minimum.reduce([floor, ceiling, right, left])
+    tof = np.minimum(np.maximum(tof, 1), max_ticks).astype(np.int64)
+
+    landing = np.stack([x0 + tof*vx, y0 + tof*vy + grav*tof*(tof + 1)/2], axis=1)
+    landing = np.minimum(np.maximum(landing, low), high)
+
+    n = len(angle)
+    target = np.full(n, -1)
+    hit_time = np.full(n, -1)
+    if targets is not None and len(targets):
+        targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        target_rad = np.broadcast_to(np.asarray(target_rad, dtype=float), (len(targets),))
+        ticks = np.arange(1, tof.max() + 1)
+        # shots are processed in chunks, so the (shots, ticks, targets) block stays small
+        chunk = max(1, 2**20 // (len(ticks) * len(targets)))
+        for start in range(0, n, chunk):
+            s = slice(start, start + chunk)
+            x = x0[s, None] + ticks*vx[s, None]
+            y = y0[s, None] + ticks*vy[s, None] + grav*ticks*(ticks + 1)/2
+            x = np.minimum(np.maximum(x, low[0]), high[0])
+            y = np.minimum(np.maximum(y, low[1]), high[1])
+            dist2 = (x[..., None] - targets[:, 0])**2 + (y[..., None] - targets[:, 1])**2
+            hit = dist2 <= (rad + target_rad)**2
+            # nothing after the first wall contact counts
+            hit &= (ticks <= tof[s, None])[..., None]
+            any_tick = hit.any(axis=2)
+            first = np.argmax(any_tick, axis=1)
+            found = any_tick[np.arange(len(first)), first]
+            rows = np.flatnonzero(found)
+            hit_time[s][rows] = ticks[first[rows]]
+            target[s][rows] = np.argmax(hit[rows, first[rows]], axis=1)
+    return {'landing': landing, 'tof': tof, 'target': target, 'hit_time': hit_time}